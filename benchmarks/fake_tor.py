@@ -0,0 +1,346 @@
+"""
+In-process fake Tor for benchmarks
+
+FakeTorControlServer speaks enough of the control protocol for dtor
+(PROTOCOLINFO, AUTHCHALLENGE/AUTHENTICATE with SAFECOOKIE or COOKIE, GETINFO,
+GETCONF/SETCONF/RESETCONF/SAVECONF, ADD_ONION/DEL_ONION, SIGNAL, SETEVENTS)
+and FakeSocksListener accepts SOCKS5 connections and echoes the relayed bytes.
+
+Run as a script (``fake_tor.py -f torrc``) it behaves like a Tor executable:
+it reads the torrc, opens the configured listeners, writes the control cookie
+and prints Tor-style "Opened ... listener" and "Bootstrapped" log lines.
+"""
+
+import sys
+import hmac
+import time
+import shlex
+import socket
+import signal
+import hashlib
+import secrets
+import threading
+import socketserver
+from pathlib import Path
+from typing import Optional, Dict, List
+
+SAFECOOKIE_SERVER_KEY = b"Tor safe cookie authentication server-to-controller hash"
+SAFECOOKIE_CLIENT_KEY = b"Tor safe cookie authentication controller-to-server hash"
+KNOWN_EVENTS = set("CIRC STREAM ORCONN BW DEBUG INFO NOTICE WARN ERR NEWDESC ADDRMAP STATUS_GENERAL "
+                   "STATUS_CLIENT STATUS_SERVER GUARD NS STREAM_BW NEWCONSENSUS SIGNAL CONF_CHANGED "
+                   "CIRC_MINOR HS_DESC HS_DESC_CONTENT NETWORK_LIVENESS CIRC_BW CONN_BW".split())
+
+
+class FakeTorState:
+    """Configuration, onion services and counters shared by all control connections"""
+    
+    def __init__(self, cookie_path: Optional[Path] = None):
+        self.cookie = secrets.token_bytes(32)
+        self.cookie_path = cookie_path
+        if cookie_path is not None:
+            Path(cookie_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(cookie_path).write_bytes(self.cookie)
+        self.conf: Dict[str, List[str]] = {}
+        self.onions: Dict[str, int] = {}
+        self.bootstrap = 100
+        self.commands = 0
+        self.shutdown_callback = None
+        self.lock = threading.Lock()
+
+
+class FakeTorControlHandler(socketserver.StreamRequestHandler):
+    def send(self, text: str) -> None:
+        self.wfile.write(text.encode())
+        self.wfile.flush()
+    
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def handle(self):
+        state: FakeTorState = self.server.state
+        self.authenticated = False
+        self.client_nonce = self.server_nonce = None
+        
+        for raw_line in self.rfile:
+            line = raw_line.decode(errors="replace").rstrip("\r\n")
+            command, _, argument = line.partition(" ")
+            command = command.upper()
+            with state.lock:
+                state.commands += 1
+            
+            if command in ("PROTOCOLINFO", "AUTHCHALLENGE", "AUTHENTICATE"):
+                if not self.handle_auth(state, command, argument):
+                    return
+            elif not self.authenticated:
+                self.send("514 Authentication required.\r\n")
+                return
+            elif command == "QUIT":
+                self.send("250 closing connection\r\n")
+                return
+            else:
+                handler = getattr(self, f"handle_{command.lower()}", None)
+                if handler is None:
+                    self.send(f'510 Unrecognized command "{command}"\r\n')
+                elif handler(state, argument) is False:
+                    return
+    
+    # ==================== AUTHENTICATION ====================
+    def handle_auth(self, state: FakeTorState, command: str, argument: str) -> bool:
+        if command == "PROTOCOLINFO":
+            self.send(f'250-PROTOCOLINFO 1\r\n250-AUTH METHODS=COOKIE,SAFECOOKIE COOKIEFILE="{state.cookie_path or ""}"\r\n'
+                      '250-VERSION Tor="0.4.8.10"\r\n250 OK\r\n')
+            return True
+        
+        if command == "AUTHCHALLENGE":
+            self.client_nonce = bytes.fromhex(argument.split()[1])
+            self.server_nonce = secrets.token_bytes(32)
+            message = state.cookie + self.client_nonce + self.server_nonce
+            server_hash = hmac.new(SAFECOOKIE_SERVER_KEY, message, hashlib.sha256).hexdigest().upper()
+            self.send(f"250 AUTHCHALLENGE SERVERHASH={server_hash} SERVERNONCE={self.server_nonce.hex().upper()}\r\n")
+            return True
+        
+        token = bytes.fromhex(argument.strip().strip('"')) if argument.strip() else b""
+        if self.client_nonce is not None:
+            message = state.cookie + self.client_nonce + self.server_nonce
+            expected = hmac.new(SAFECOOKIE_CLIENT_KEY, message, hashlib.sha256).digest()
+        else:
+            expected = state.cookie
+        if not hmac.compare_digest(token, expected):
+            self.send("515 Authentication failed: Wrong length on authentication cookie.\r\n")
+            return False
+        self.authenticated = True
+        self.send("250 OK\r\n")
+        return True
+    
+    # ==================== COMMANDS ====================
+    def handle_getinfo(self, state: FakeTorState, argument: str) -> None:
+        lines = []
+        for key in argument.split():
+            if key == "version":
+                lines.append("250-version=0.4.8.10 (git-0000000000000000)")
+            elif key in ("traffic/read", "traffic/written"):
+                lines.append(f"250-{key}={state.commands * 512}")
+            elif key == "status/bootstrap-phase":
+                tag = "done" if state.bootstrap >= 100 else "loading_descriptors"
+                lines.append(f'250-status/bootstrap-phase=NOTICE BOOTSTRAP PROGRESS={state.bootstrap} TAG={tag} SUMMARY="{tag.title()}"')
+            elif key == "net/listeners/socks":
+                listeners = " ".join(f'"127.0.0.1:{port}"' for port in self.server.socks_ports)
+                lines.append(f"250-net/listeners/socks={listeners}")
+            elif key == "net/listeners/control":
+                lines.append(f'250-net/listeners/control="127.0.0.1:{self.server.server_address[1]}"')
+            elif key == "circuit-status":
+                lines.append("250+circuit-status=\r\n"
+                             "1 BUILT $A~relay1,$B~relay2,$C~relay3 PURPOSE=GENERAL\r\n"
+                             "2 BUILT $D~relay4,$E~relay5,$F~relay6 PURPOSE=GENERAL\r\n.")
+            else:
+                self.send(f'552 Unrecognized key "{key}"\r\n')
+                return
+        self.send("\r\n".join(lines) + "\r\n250 OK\r\n")
+    
+    def handle_getconf(self, state: FakeTorState, argument: str) -> None:
+        lines = []
+        for key in argument.split():
+            values = state.conf.get(key) or [None]
+            lines.extend(f"{key}={value}" if value is not None else key for value in values)
+        self.send("".join(f"250{' ' if index == len(lines) - 1 else '-'}{line}\r\n" for index, line in enumerate(lines)))
+    
+    def handle_setconf(self, state: FakeTorState, argument: str) -> None:
+        updates: Dict[str, List[str]] = {}
+        for token in shlex.split(argument):
+            key, _, value = token.partition("=")
+            updates.setdefault(key, []).append(value)
+        with state.lock:
+            state.conf.update(updates)
+        self.send("250 OK\r\n")
+    
+    def handle_resetconf(self, state: FakeTorState, argument: str) -> None:
+        self.handle_setconf(state, argument)
+    
+    def handle_saveconf(self, state: FakeTorState, argument: str) -> None:
+        self.send("250 OK\r\n")
+    
+    def handle_add_onion(self, state: FakeTorState, argument: str) -> None:
+        key = argument.split()[0]
+        service_id = secrets.token_hex(28)
+        with state.lock:
+            state.onions[service_id] = len(state.onions)
+        reply = f"250-ServiceID={service_id}\r\n"
+        if key.startswith("NEW"):
+            reply += f"250-PrivateKey=ED25519-V3:{secrets.token_urlsafe(48)}\r\n"
+        self.send(reply + "250 OK\r\n")
+    
+    def handle_del_onion(self, state: FakeTorState, argument: str) -> None:
+        with state.lock:
+            removed = state.onions.pop(argument.strip(), None)
+        self.send("250 OK\r\n" if removed is not None else "552 Unknown Onion Service id\r\n")
+    
+    def handle_signal(self, state: FakeTorState, argument: str) -> Optional[bool]:
+        self.send("250 OK\r\n")
+        if argument.strip().upper() in ("SHUTDOWN", "HALT") and state.shutdown_callback:
+            state.shutdown_callback()
+            return False
+        return None
+    
+    def handle_setevents(self, state: FakeTorState, argument: str) -> None:
+        unknown = set(argument.upper().split()) - KNOWN_EVENTS
+        if unknown:
+            self.send(f'552 Unrecognized event "{sorted(unknown)[0]}"\r\n')
+            return
+        self.send("250 OK\r\n")
+        if "STATUS_CLIENT" in argument.upper():
+            self.send(f'650 STATUS_CLIENT NOTICE BOOTSTRAP PROGRESS={state.bootstrap} TAG=done SUMMARY="Done"\r\n')
+
+
+class FakeTorControlServer(socketserver.ThreadingTCPServer):
+    """Fake control port on 127.0.0.1 (port 0 picks a free port)"""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, port: int = 0, cookie_path: Optional[Path] = None, socks_ports: Optional[List[int]] = None):
+        super().__init__(("127.0.0.1", port), FakeTorControlHandler)
+        self.state = FakeTorState(cookie_path)
+        self.socks_ports = socks_ports or []
+        self.thread = threading.Thread(target=self.serve_forever, name="fake-tor-control", daemon=True)
+    
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+    
+    def start(self) -> "FakeTorControlServer":
+        self.thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class FakeSocksHandler(socketserver.BaseRequestHandler):
+    """SOCKS5 without authentication: accept any CONNECT, then echo"""
+    
+    def handle(self):
+        sock = self.request
+        try:
+            greeting = sock.recv(2)
+            if len(greeting) < 2 or greeting[0] != 5:
+                return
+            sock.recv(greeting[1])
+            sock.sendall(b"\x05\x00")
+            
+            header = sock.recv(4)
+            if len(header) < 4:
+                return
+            address_type = header[3]
+            if address_type == 1:
+                sock.recv(4 + 2)
+            elif address_type == 3:
+                sock.recv(sock.recv(1)[0] + 2)
+            elif address_type == 4:
+                sock.recv(16 + 2)
+            sock.sendall(b"\x05\x00\x00\x01\x7f\x00\x00\x01\x00\x00")
+            
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    return
+                sock.sendall(data)
+        except OSError:
+            pass
+
+
+class FakeSocksListener(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), FakeSocksHandler)
+        self.thread = threading.Thread(target=self.serve_forever, name="fake-tor-socks", daemon=True)
+    
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+    
+    def start(self) -> "FakeSocksListener":
+        self.thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+# ==================== FAKE EXECUTABLE ====================
+def write_fake_executable(path: Path) -> Path:
+    """Create an executable "tor" that runs this module with the current interpreter (POSIX only)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"#!{sys.executable}\n"
+                    f"import sys\nsys.path.insert(0, {str(Path(__file__).parent.resolve())!r})\n"
+                    "import fake_tor\nsys.exit(fake_tor.main(sys.argv[1:]))\n", encoding="utf-8")
+    path.chmod(0o755)
+    return path
+
+
+def read_torrc(path: Path) -> Dict[str, List[str]]:
+    options: Dict[str, List[str]] = {}
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            key, _, value = line.partition(" ")
+            options.setdefault(key, []).append(value.strip())
+    return options
+
+
+def log(severity: str, message: str) -> None:
+    print(time.strftime("%b %d %H:%M:%S.000") + f" [{severity}] {message}", flush=True)
+
+
+def main(argv: List[str]) -> int:
+    torrc = read_torrc(Path(argv[argv.index("-f") + 1]))
+    data_directory = Path(torrc.get("DataDirectory", ["."])[0].strip('"'))
+    data_directory.mkdir(parents=True, exist_ok=True)
+    log("notice", "Tor 0.4.8.10 (fake) running on benchmark.")
+    
+    listeners = []
+    for value in torrc.get("SocksPort", []):
+        port = shlex.split(value)[0]
+        listener = FakeSocksListener(0 if port == "auto" else int(port)).start()
+        listeners.append(listener)
+        log("notice", f"Opened Socks listener connection (ready) on 127.0.0.1:{listener.port}")
+    
+    stopped = threading.Event()
+    servers = []
+    for value in torrc.get("ControlPort", []):
+        port = shlex.split(value)[0]
+        server = FakeTorControlServer(0 if port == "auto" else int(port), data_directory / "control_auth_cookie",
+                                      [listener.port for listener in listeners])
+        server.state.shutdown_callback = stopped.set
+        servers.append(server.start())
+        log("notice", f"Opened Control listener connection (ready) on 127.0.0.1:{server.port}")
+    
+    if "ControlPortWriteToFile" in torrc:
+        Path(torrc["ControlPortWriteToFile"][0].strip('"')).write_text(
+            "".join(f"PORT=127.0.0.1:{server.port}\n" for server in servers), encoding="utf-8")
+    
+    for value in torrc.get("HiddenServiceDir", []):
+        service_dir = Path(value.strip('"'))
+        service_dir.mkdir(parents=True, exist_ok=True)
+        (service_dir / "hostname").write_text(secrets.token_hex(28) + ".onion\n", encoding="utf-8")
+    
+    for percent, tag in ((0, "starting"), (100, "done")):
+        log("notice", f"Bootstrapped {percent}% ({tag}): {tag.title()}")
+    
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    # Give the SIGNAL reply time to reach the controller before the sockets close
+    time.sleep(0.01)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,339 @@
+"""
+dtor benchmark suite
+
+Measures control-port round trips, pipelined and concurrent command throughput,
+startup-to-ready time, port scanning and torrc load/save against the in-process
+fake Tor in fake_tor.py, so no Tor binary or network access is needed.
+
+Results are written to benchmarks/results/<version>_<timestamp>.json and compared
+with the previous result file (or the one given with --compare).
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --only control_roundtrip,torrc_save --rounds 50
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/0.0.7_20240101-120000.json
+"""
+
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Optional, Dict, List, Callable
+
+BENCHMARK_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(BENCHMARK_DIR.parent))
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+import dtor
+from dtor import TorHandler, AsyncTorHandler
+from fake_tor import FakeTorControlServer, write_fake_executable
+
+RESULTS_DIR = BENCHMARK_DIR / "results"
+BENCHMARKS: Dict[str, Dict] = {}
+
+
+def benchmark(name: str, rounds: int, operations: int = 1):
+    """Register a benchmark; ``operations`` is how many operations one round performs"""
+    def decorate(setup):
+        BENCHMARKS[name] = {'setup': setup, 'rounds': rounds, 'operations': operations}
+        return setup
+    return decorate
+
+
+def measure(run: Callable[[], Optional[float]], rounds: int, operations: int, warmup: int = 2) -> Dict[str, float]:
+    """Time ``rounds`` calls of ``run`` and summarise the per-operation durations in seconds
+    
+    A ``run`` that returns a float reports its own duration (to leave teardown out).
+    """
+    for _ in range(warmup):
+        run()
+    
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = run()
+        elapsed = result if isinstance(result, float) else time.perf_counter() - started
+        samples.append(elapsed / operations)
+    
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        'rounds': rounds,
+        'operations_per_round': operations,
+        'min': samples[0],
+        'max': samples[-1],
+        'mean': statistics.fmean(samples),
+        'median': median,
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'ops_per_sec': 1 / median if median else 0.0
+    }
+
+
+# ==================== FIXTURES ====================
+def make_handler(handler_class=TorHandler, workdir: Optional[Path] = None) -> TorHandler:
+    """Handler in a throwaway base directory, with its own log kept out of the timings"""
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="dtor-bench-"))
+    handler = handler_class(recover=False, backup_dir=workdir)
+    handler.log_level = 2
+    return handler
+
+
+class FakeTorFixture:
+    """A handler connected to an in-process fake control port, as if Tor were running"""
+    
+    def __init__(self, handler_class=TorHandler):
+        self.handler = make_handler(handler_class)
+        self.server = FakeTorControlServer(cookie_path=self.handler.data_directory / "control_auth_cookie").start()
+        self.handler.control_port = [self.server.port]
+        self.handler.running = True
+    
+    def close(self) -> None:
+        self.handler.control_pool.close_all()
+        self.handler.running = False
+        self.server.stop()
+        shutil.rmtree(self.handler.base_dir, ignore_errors=True)
+
+
+# ==================== BENCHMARKS ====================
+@benchmark("control_roundtrip", rounds=200)
+def bench_control_roundtrip():
+    """One GETINFO over the pooled control connection"""
+    fixture = FakeTorFixture()
+    return lambda: fixture.handler.send_control_commands("GETINFO version", skip_wait=True), fixture.close
+
+
+@benchmark("control_pipelined_100", rounds=30, operations=100)
+def bench_control_pipelined():
+    """100 GETINFO commands written in one batch (per-command time; ops/sec = commands/sec)"""
+    fixture = FakeTorFixture()
+    commands = ["GETINFO version"] * 100
+    return lambda: fixture.handler.send_control_commands(commands, skip_wait=True, pipeline=True), fixture.close
+
+
+@benchmark("control_sequential_100", rounds=10, operations=100)
+def bench_control_sequential():
+    """100 GETINFO commands, one round trip each"""
+    fixture = FakeTorFixture()
+    commands = ["GETINFO version"] * 100
+    return lambda: fixture.handler.send_control_commands(commands, skip_wait=True), fixture.close
+
+
+@benchmark("async_concurrent_100", rounds=30, operations=100)
+def bench_async_concurrent():
+    """100 concurrent coroutines sharing AsyncTorHandler's pipelined connection"""
+    fixture = FakeTorFixture(AsyncTorHandler)
+    loop = asyncio.new_event_loop()
+    
+    async def batch():
+        await asyncio.gather(*[fixture.handler.send_control_commands("GETINFO version", skip_wait=True) for _ in range(100)])
+    
+    def close():
+        loop.run_until_complete(fixture.handler.close_control_connection())
+        loop.close()
+        fixture.close()
+    
+    return lambda: loop.run_until_complete(batch()), close
+
+
+@benchmark("add_del_onion", rounds=100)
+def bench_add_del_onion():
+    """ADD_ONION with a new key followed by DEL_ONION of the returned service"""
+    fixture = FakeTorFixture()
+    
+    def run():
+        reply = fixture.handler.send_control_commands("ADD_ONION NEW:ED25519-V3 Flags=DiscardPK Port=80,127.0.0.1:8080", skip_wait=True)
+        service_id = reply[1]['reply'].values()['ServiceID']
+        fixture.handler.send_control_commands(f"DEL_ONION {service_id}", skip_wait=True)
+    
+    return run, fixture.close
+
+
+@benchmark("getconf_setconf", rounds=100)
+def bench_getconf_setconf():
+    """SETCONF followed by GETCONF of the same option"""
+    fixture = FakeTorFixture()
+    commands = ["SETCONF MaxCircuitDirtiness=600", "GETCONF MaxCircuitDirtiness"]
+    return lambda: fixture.handler.send_control_commands(commands, skip_wait=True, pipeline=True), fixture.close
+
+
+@benchmark("startup_to_ready", rounds=5)
+def bench_startup_to_ready():
+    """start_tor_service with a fake Tor executable, until SOCKS and control listeners are open"""
+    if platform.system() == "Windows":
+        return None
+    handler = make_handler()
+    handler.tor_executable_override = write_fake_executable(Path(handler.base_dir, "fake_bin", "tor"))
+    # Tor picks the ports ("auto") and dtor reads them back, so rounds never collide
+    handler.socks_port, handler.control_port = [[port] for port in handler.find_available_ports(20000, 2)]
+    handler.auto_ports = True
+    handler.save_torrc_configuration()
+    
+    def run() -> float:
+        started = time.perf_counter()
+        if not handler.start_tor_service():
+            raise RuntimeError("Fake Tor did not start")
+        elapsed = time.perf_counter() - started
+        handler.stop_tor_service()
+        return elapsed
+    
+    def close():
+        handler.stop_tor_service()
+        shutil.rmtree(handler.base_dir, ignore_errors=True)
+    
+    return run, close
+
+
+@benchmark("port_scan_1000", rounds=50)
+def bench_port_scan():
+    """scan_listening_ports over 1000 ports (kernel socket table, else concurrent probes)"""
+    handler = make_handler()
+    ports = list(range(20000, 21000))
+    return lambda: handler.scan_listening_ports(ports), lambda: shutil.rmtree(handler.base_dir, ignore_errors=True)
+
+
+@benchmark("find_available_ports", rounds=50)
+def bench_find_available_ports():
+    """find_available_ports for 3 SocksPorts, including the cross-process lock check"""
+    handler = make_handler()
+    return lambda: handler.find_available_ports(20000, 3), lambda: shutil.rmtree(handler.base_dir, ignore_errors=True)
+
+
+def populated_handler() -> TorHandler:
+    handler = make_handler()
+    handler.socks_port = [19050, 19052, 19054]
+    handler.control_port = [19051, 19053]
+    for index in range(handler.max_hidden_services):
+        handler.register_hidden_service(80 + index, 18080 + index)
+    return handler
+
+
+@benchmark("torrc_save", rounds=100)
+def bench_torrc_save():
+    """save_torrc_configuration with 3 SocksPorts, 2 ControlPorts and 3 hidden services"""
+    handler = populated_handler()
+    return handler.save_torrc_configuration, lambda: shutil.rmtree(handler.base_dir, ignore_errors=True)
+
+
+@benchmark("torrc_load", rounds=100)
+def bench_torrc_load():
+    """load_torrc_configuration of the same torrc"""
+    handler = populated_handler()
+    handler.save_torrc_configuration()
+    return handler.load_torrc_configuration, lambda: shutil.rmtree(handler.base_dir, ignore_errors=True)
+
+
+# ==================== RESULTS ====================
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run_benchmarks(names: List[str], rounds: Optional[int] = None) -> Dict:
+    results = {}
+    for name in names:
+        spec = BENCHMARKS[name]
+        prepared = spec['setup']()
+        if prepared is None:
+            print(f"{name:<24} skipped on {platform.system()}")
+            continue
+        
+        run, close = prepared
+        try:
+            results[name] = measure(run, rounds or spec['rounds'], spec['operations'])
+            results[name]['description'] = (spec['setup'].__doc__ or "").strip()
+        finally:
+            close()
+        
+        stats = results[name]
+        print(f"{name:<24} median {stats['median'] * 1e6:>12.1f} us   p95 {stats['p95'] * 1e6:>12.1f} us   "
+              f"{stats['ops_per_sec']:>12.0f} ops/s")
+    
+    return {
+        'meta': {
+            'dtor_version': dtor.__version__,
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'benchmarks': results
+    }
+
+
+def latest_result_file(exclude: Optional[Path] = None) -> Optional[Path]:
+    files = sorted((path for path in RESULTS_DIR.glob("*.json") if path != exclude), key=lambda path: path.stat().st_mtime)
+    return files[-1] if files else None
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float) -> int:
+    """Print median changes against a baseline; returns the number of regressions beyond ``threshold``"""
+    meta = baseline.get('meta', {})
+    print(f"\nCompared with dtor {meta.get('dtor_version', '?')} {meta.get('git_revision', '')} ({meta.get('timestamp', '?')}):")
+    regressions = 0
+    for name, stats in current['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous or not previous.get('median'):
+            print(f"{name:<24} new")
+            continue
+        change = (stats['median'] - previous['median']) / previous['median'] * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:<24} {previous['median'] * 1e6:>12.1f} us -> {stats['median'] * 1e6:>12.1f} us  {change:+7.1f}%{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark dtor against an in-process fake Tor")
+    parser.add_argument("--only", help="Comma-separated benchmark names (default: all)")
+    parser.add_argument("--rounds", type=int, help="Override the number of rounds of every benchmark")
+    parser.add_argument("--compare", type=Path, help="Result file to compare with (default: the latest one)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Median slowdown in %% reported as a regression")
+    parser.add_argument("--no-save", action="store_true", help="Do not write a result file")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    args = parser.parse_args()
+    
+    if args.list:
+        for name, spec in BENCHMARKS.items():
+            print(f"{name:<24} {(spec['setup'].__doc__ or '').strip()}")
+        return 0
+    
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    
+    results = run_benchmarks(names, args.rounds)
+    
+    result_file = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        result_file = RESULTS_DIR / f"{dtor.__version__}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(result_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {result_file}")
+    
+    baseline_file = args.compare or latest_result_file(exclude=result_file)
+    if baseline_file is None:
+        return 0
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    return 1 if compare_results(results, baseline, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
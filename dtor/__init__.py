@@ -7,6 +7,10 @@ services, and runtime control.
 
 Main Classes:
     TorHandler: Main class for Tor process lifecycle management
+    AsyncTorHandler: Asyncio-native TorHandler sharing one pipelined control connection
+    TorPool: Several isolated Tor instances with endpoint selection and rolling restarts
+    SocksFrontProxy: One SOCKS listener balancing connections over many SocksPorts
+    TorMetricsExporter: OpenMetrics endpoint for Tor and dtor metrics
 
 Example:
     from dtor import TorHandler
@@ -24,5 +28,9 @@ __email__ = "0xAhmadYousuf@protonmail.com"
 __license__ = "MIT"
 
 from .tor_lib import TorHandler
+from .async_tor_lib import AsyncTorHandler
+from .pool_lib import TorPool
+from .proxy_lib import SocksFrontProxy
+from .metrics_lib import TorMetricsExporter
 
-__all__ = ['TorHandler']
+__all__ = ['TorHandler', 'AsyncTorHandler', 'TorPool', 'SocksFrontProxy', 'TorMetricsExporter']
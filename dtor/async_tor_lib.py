@@ -0,0 +1,858 @@
+import time
+import asyncio
+import platform
+import subprocess
+import collections
+from typing import Optional, Dict, List, Union
+
+from pathlib import Path
+
+from .tor_lib import (TorHandler, ControlReply, ControlReplyParser, is_read_only_batch,
+                      select_auth_method, build_auth_commands, build_safecookie_response)
+from .trace_lib import instrumented
+
+
+class AsyncEventSubscription:
+    """Asynchronous iterator over control events delivered by an AsyncTorHandler
+    
+    Example:
+        async with await handler.subscribe_events(["CIRC", "STREAM"]) as events:
+            async for event in events:
+                print(event.event_type, event.raw)
+    """
+    
+    def __init__(self, handler: "AsyncTorHandler", event_types: List[str], callback=None, max_queue: int = 10000):
+        self.handler = handler
+        self.event_types = [event.upper() for event in event_types]
+        self.callback = callback
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.dropped_count = 0
+    
+    def deliver(self, event: Optional[ControlReply]) -> None:
+        """Called by the connection reader for every matching event (None on close)"""
+        if event is not None and self.callback is not None:
+            try:
+                result = self.callback(event)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                self.handler.logger("Event callback failed | Event: %s", 1, e, func_id="F42", args=(event.event_type,))
+        
+        if self.queue.full():
+            # Slow consumer: drop the oldest event rather than stalling the reader
+            self.queue.get_nowait()
+            self.dropped_count += 1
+        self.queue.put_nowait(event)
+    
+    def matches(self, event: ControlReply) -> bool:
+        return event.event_type in self.event_types
+    
+    async def get(self) -> Optional[ControlReply]:
+        """Return the next event, or None once the subscription is closed"""
+        if self.closed and self.queue.empty():
+            return None
+        return await self.queue.get()
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> ControlReply:
+        event = await self.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+    
+    async def close(self) -> None:
+        """Unsubscribe; other subscriptions on the handler stay active"""
+        if self.closed:
+            return
+        self.closed = True
+        self.deliver(None)
+        await self.handler.unsubscribe_events(self)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class AsyncControlConnection:
+    """Authenticated asyncio control connection shared by many coroutines
+    
+    Commands from concurrent coroutines are pipelined on the one connection; a
+    single reader task hands replies back to the waiting coroutines in FIFO order,
+    which is the order Tor answers them in.
+    """
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.parser = ControlReplyParser()
+        self.pending: collections.deque = collections.deque()
+        self.event_listeners: List = []
+        self.closed = False
+        self.reader_task = asyncio.ensure_future(self.read_loop())
+    
+    @classmethod
+    async def open(cls, host: str, port: Union[int, str], cookie: Optional[bytes], timeout: float = 10) -> "AsyncControlConnection":
+        """Connect to the control port (TCP or "unix:/path") and authenticate
+        
+        PROTOCOLINFO picks the method; SAFECOOKIE is preferred over sending the cookie.
+        """
+        if isinstance(port, str) and port.startswith("unix:"):
+            connect = asyncio.open_unix_connection(port[len("unix:"):].strip('"'))
+        else:
+            connect = asyncio.open_connection(host, port)
+        reader, writer = await asyncio.wait_for(connect, timeout)
+        connection = cls(reader, writer)
+        try:
+            protocolinfo = (await connection.send_commands(['PROTOCOLINFO 1'], timeout))[0]
+            if not protocolinfo.is_ok:
+                raise RuntimeError(f"PROTOCOLINFO failed: {protocolinfo.raw}")
+            command, client_nonce = build_auth_commands(select_auth_method(protocolinfo), cookie)
+            if client_nonce is not None:
+                challenge = (await connection.send_commands([command], timeout))[0]
+                if not challenge.is_ok:
+                    raise RuntimeError(f"AUTHCHALLENGE failed: {challenge.raw}")
+                command = build_safecookie_response(cookie, client_nonce, challenge)
+            
+            reply = (await connection.send_commands([command], timeout))[0]
+            if not reply.is_ok:
+                raise RuntimeError(f"Authentication failed: {reply.raw}")
+        except BaseException:
+            await connection.close()
+            raise
+        return connection
+    
+    async def read_loop(self) -> None:
+        error: Optional[BaseException] = None
+        try:
+            while True:
+                chunk = await self.reader.read(65536)
+                if not chunk:
+                    break
+                for reply in self.parser.feed(chunk):
+                    if reply.is_event:
+                        for listener in list(self.event_listeners):
+                            listener(reply)
+                        continue
+                    if self.pending:
+                        future = self.pending.popleft()
+                        # A cancelled waiter still owns its slot, so the reply is dropped here
+                        if not future.done():
+                            future.set_result(reply)
+        except asyncio.CancelledError:
+            error = ConnectionError("Control connection closed")
+        except Exception as e:
+            error = e
+        finally:
+            self.closed = True
+            while self.pending:
+                future = self.pending.popleft()
+                if not future.done():
+                    future.set_exception(error or ConnectionError("Control connection closed by Tor"))
+    
+    async def send_commands(self, commands: List[str], timeout: float = 10) -> List[ControlReply]:
+        """Pipeline commands and wait for their replies in order"""
+        if self.closed:
+            raise ConnectionError("Control connection is closed")
+        
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in commands]
+        # Queue the waiters and write in one step so concurrent callers keep reply order
+        self.pending.extend(futures)
+        self.writer.write("".join(cmd + "\r\n" for cmd in commands).encode())
+        await self.writer.drain()
+        return list(await asyncio.wait_for(asyncio.gather(*futures), timeout))
+    
+    async def close(self) -> None:
+        self.closed = True
+        self.reader_task.cancel()
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+
+class AsyncTorHandler(TorHandler):
+    """Asyncio-native TorHandler
+    
+    Configuration, torrc and hidden service bookkeeping are inherited from
+    TorHandler. Lifecycle, readiness and control-port methods are coroutines that
+    share one pipelined control connection, so many concurrent operations can run
+    on a single event loop without threads.
+    
+    Example:
+        handler = AsyncTorHandler(recover=False)
+        await handler.start_tor_service()
+        responses = await handler.send_control_commands("GETINFO version")
+        await handler.stop_tor_service()
+    """
+    
+    def __init__(self, recover=True, backup_dir=None):
+        self.control_connection: Optional[AsyncControlConnection] = None
+        self.connection_lock: Optional[asyncio.Lock] = None
+        self.tor_process: Optional[asyncio.subprocess.Process] = None
+        self.output_task: Optional[asyncio.Future] = None
+        self.output_event: Optional[asyncio.Event] = None
+        self.event_subscriptions: List[AsyncEventSubscription] = []
+        super().__init__(recover=recover, backup_dir=backup_dir)
+    
+    # ==================== CONTROL PORT COMMUNICATION ====================
+    async def get_control_connection(self) -> AsyncControlConnection:
+        """Return the shared control connection, connecting and authenticating if needed"""
+        # Created lazily so the lock binds to the running loop
+        if self.connection_lock is None:
+            self.connection_lock = asyncio.Lock()
+        
+        async with self.connection_lock:
+            if self.control_connection is None or self.control_connection.closed:
+                cookie = await asyncio.get_running_loop().run_in_executor(None, self.read_authentication_cookie)
+                connection = await AsyncControlConnection.open("127.0.0.1", self.control_port[0], cookie)
+                connection.event_listeners.append(self.dispatch_event)
+                
+                # Events are per connection, so restore subscriptions after a reconnect
+                event_types = self.subscribed_event_types()
+                if event_types:
+                    await connection.send_commands(["SETEVENTS " + " ".join(event_types)])
+                self.control_connection = connection
+            return self.control_connection
+    
+    async def close_control_connection(self) -> None:
+        """Close the shared control connection"""
+        if self.control_connection is not None:
+            await self.control_connection.close()
+            self.control_connection = None
+    
+    @instrumented("F30")
+    async def send_control_commands(self, commands: Union[str, List[str]], skip_wait: bool = False) -> Dict:
+        """Send commands to Tor control port, pipelined on the shared connection
+        
+        Returns the same structure as TorHandler.send_control_commands.
+        """
+        response = {}
+        
+        if not skip_wait and (self.control_connection is None or self.control_connection.closed):
+            if not await self.wait_for_control_port(timeout=3):
+                self.logger("Control port not ready | Port: %s", 2, func_id="F30", error_code="E01", args=(self.control_port[0],))
+                return response
+        
+        if isinstance(commands, str):
+            commands = [commands]
+        commands = [command.strip() for command in commands]
+        
+        # The connection may have been closed by Tor while idle; retry once on a fresh one,
+        # but only if nothing was written or the batch is read-only (see TorHandler)
+        for attempt in range(2):
+            reused = attempt == 0 and self.control_connection is not None and not self.control_connection.closed
+            written = False
+            try:
+                connection = await self.get_control_connection()
+                started = time.perf_counter()
+                written = not connection.closed  # a closed connection is refused before writing
+                replies = await connection.send_commands(commands)
+                elapsed = (time.perf_counter() - started) / len(commands)
+                
+                for cmd, reply in zip(commands, replies):
+                    self.record_control_command(cmd, elapsed, not reply.is_error)
+                    response[len(response) + 1] = {
+                        'command': cmd,
+                        'response': reply.raw,
+                        'status': reply.status,
+                        'reply': reply
+                    }
+                    self.logger("Control command sent | Command: %s... | Status: %s | Response length: %s bytes", 0, func_id="F30", args=(cmd[:50], reply.status, len(reply.raw)))
+                return response
+            except (OSError, ConnectionError) as e:
+                await self.close_control_connection()
+                if reused and (not written or is_read_only_batch(commands)):
+                    self.logger("Control connection failed, reconnecting | Error: %s", 1, func_id="F30", args=(e,))
+                    continue
+                for cmd in commands:
+                    self.record_control_command(cmd, 0.0, False)
+                if self.debug:
+                    raise
+                self.logger("Control command failed", 2, e, func_id="F30", error_code="E02")
+                return response
+            except Exception as e:
+                await self.close_control_connection()
+                for cmd in commands:
+                    self.record_control_command(cmd, 0.0, False)
+                if self.debug:
+                    raise
+                self.logger("Control command failed", 2, e, func_id="F30", error_code="E02")
+                return response
+        
+        return response
+    
+    # ==================== EVENTS ====================
+    def dispatch_event(self, event: ControlReply) -> None:
+        for subscription in self.event_subscriptions:
+            if subscription.matches(event):
+                subscription.deliver(event)
+    
+    def subscribed_event_types(self) -> List[str]:
+        event_types: List[str] = []
+        for subscription in self.event_subscriptions:
+            for event_type in subscription.event_types:
+                if event_type not in event_types:
+                    event_types.append(event_type)
+        return event_types
+    
+    async def subscribe_events(self, event_types: Union[str, List[str]], callback=None) -> Optional[AsyncEventSubscription]:
+        """Subscribe to asynchronous control events (CIRC, STREAM, BW, HS_DESC, STATUS_CLIENT, ...)
+        
+        Events arrive on the shared control connection and are separated from
+        command replies by its reader task. SETEVENTS replaces Tor's per-connection
+        event set, so the union of all active subscriptions is sent each time.
+        
+        Args:
+            event_types: Event keyword(s)
+            callback: Optional callable (or coroutine function) invoked with each event
+        """
+        if isinstance(event_types, str):
+            event_types = event_types.split()
+        
+        subscription = AsyncEventSubscription(self, event_types, callback)
+        self.event_subscriptions.append(subscription)
+        
+        result = await self.send_control_commands("SETEVENTS " + " ".join(self.subscribed_event_types()))
+        if not result or not result[1]['reply'].is_ok:
+            self.event_subscriptions.remove(subscription)
+            error = ValueError(f"SETEVENTS rejected: {result[1]['response'] if result else 'no response'}")
+            if self.debug:
+                raise error
+            self.logger("Event subscription failed | Events: %s", 2, error, func_id="F42", error_code="E01", args=(' '.join(subscription.event_types),))
+            return None
+        
+        self.logger("Event subscription started | Events: %s", 0, func_id="F42", args=(' '.join(subscription.event_types),))
+        return subscription
+    
+    async def unsubscribe_events(self, subscription: AsyncEventSubscription) -> None:
+        """Remove a subscription and narrow the connection's event set accordingly"""
+        if subscription in self.event_subscriptions:
+            self.event_subscriptions.remove(subscription)
+        if self.control_connection is not None and not self.control_connection.closed:
+            await self.send_control_commands("SETEVENTS " + " ".join(self.subscribed_event_types()), skip_wait=True)
+    
+    async def close_event_subscriptions(self) -> None:
+        """End every subscription, waking up their consumers"""
+        subscriptions, self.event_subscriptions = self.event_subscriptions, []
+        for subscription in subscriptions:
+            subscription.closed = True
+            subscription.deliver(None)
+    
+    # ==================== BOOTSTRAP PROGRESS ====================
+    @instrumented("F43")
+    async def wait_for_bootstrap(self, target_percent: int = 100, timeout: float = 120, callback=None) -> bool:
+        """Non-blocking equivalent of TorHandler.wait_for_bootstrap"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        monitor = self.tor_monitor
+        progressed = asyncio.Event()
+        subscription = None
+        
+        def on_progress(percent, tag, summary, source):
+            if self.update_bootstrap_status(percent, tag, summary, source):
+                progressed.set()
+                if callback:
+                    try:
+                        callback(self.get_bootstrap_status())
+                    except Exception as e:
+                        self.logger("Bootstrap callback failed", 1, e, func_id="F43")
+        
+        def on_event(event):
+            phase = self.parse_bootstrap_phase(event.lines[0][2])
+            if phase:
+                on_progress(*phase, 'event')
+        
+        if monitor is not None:
+            monitor.bootstrap_callbacks.append(on_progress)
+            if monitor.bootstrap_percent:
+                on_progress(monitor.bootstrap_percent, monitor.bootstrap_tag, monitor.bootstrap_summary, 'log')
+        
+        try:
+            if self.running and self.control_port:
+                subscription = await self.subscribe_events("STATUS_CLIENT", callback=on_event)
+                
+                # Events only report changes; ask for the current phase once
+                result = await self.send_control_commands("GETINFO status/bootstrap-phase", skip_wait=True)
+                if result:
+                    phase = self.parse_bootstrap_phase(result[1]['response'])
+                    if phase:
+                        on_progress(*phase, 'getinfo')
+            
+            while self.bootstrap_status['percent'] < target_percent:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or (monitor is not None and monitor.exited):
+                    break
+                progressed.clear()
+                try:
+                    await asyncio.wait_for(progressed.wait(), min(remaining, 0.5))
+                except asyncio.TimeoutError:
+                    pass
+            
+            status = self.get_bootstrap_status()
+            if status['percent'] >= target_percent:
+                self.logger("Tor bootstrapped | Percent: %s | Phase: %s | Elapsed: %ss", 0, func_id="F43", args=(status['percent'], status['tag'], status['elapsed']))
+                return True
+            
+            self.logger("Bootstrap wait failed | Percent: %s | Target: %s | Exited: %s", 2, func_id="F43", error_code="E01", args=(status['percent'], target_percent, bool(monitor and monitor.exited)))
+            return False
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Bootstrap wait failed", 2, e, func_id="F43", error_code="E02")
+            return False
+        finally:
+            if monitor is not None and on_progress in monitor.bootstrap_callbacks:
+                monitor.bootstrap_callbacks.remove(on_progress)
+            if subscription is not None:
+                await subscription.close()
+    
+    # ==================== READINESS ====================
+    async def is_port_listening(self, port: Union[int, str], timeout: float = 0.5) -> bool:
+        """Non-blocking equivalent of is_endpoint_listening (True if IN USE)"""
+        try:
+            if self.is_unix_endpoint(port):
+                connect = asyncio.open_unix_connection(str(self.unix_socket_path(port)))
+            else:
+                connect = asyncio.open_connection("127.0.0.1", port)
+            _, writer = await asyncio.wait_for(connect, timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+        return True
+    
+    @instrumented("F13")
+    async def wait_for_control_port(self, timeout: int = 15, wait_after_ready: int = 0) -> bool:
+        """Wait until the control port accepts an authenticated connection"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        last_error: Optional[Exception] = None
+        
+        while loop.time() < deadline:
+            if self.tor_process is not None and self.tor_process.returncode is not None:
+                break
+            try:
+                await self.get_control_connection()
+                if wait_after_ready > 0:
+                    await asyncio.sleep(wait_after_ready)
+                return True
+            except Exception as e:
+                last_error = e
+                await asyncio.sleep(0.2)
+        
+        self.logger("Control port timeout | Port: %s | Timeout: %ss", 2, last_error, func_id="F13", error_code="E01", args=(self.control_port[0], timeout))
+        return False
+    
+    async def wait_for_tor_ready(self, timeout: int = 30) -> bool:
+        """Wait until Tor's SOCKS and control listeners are open
+        
+        Woken by the output reader whenever Tor logs a milestone; falls back to
+        probing the first SocksPort when Tor's output is not being monitored.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        monitor = self.tor_monitor
+        
+        while loop.time() < deadline:
+            if monitor is not None and self.output_event is not None:
+                if monitor.exited:
+                    return False
+                if (monitor.listener_count('socks') >= len(self.socks_port) and
+                        monitor.listener_count('control') >= len(self.control_port)):
+                    if self.cookie_authentication and self.control_port:
+                        cookie_path = self.data_directory / "control_auth_cookie"
+                        return await self.wait_for_path_async(cookie_path, deadline - loop.time(), monitor.started_at)
+                    return True
+                
+                self.output_event.clear()
+                try:
+                    await asyncio.wait_for(self.output_event.wait(), min(0.5, deadline - loop.time()))
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+                # Tor may log elsewhere (e.g. a Log directive); then only probing works
+                if monitor.listeners:
+                    continue
+            elif self.tor_process is not None and self.tor_process.returncode is not None:
+                return False
+            else:
+                await asyncio.sleep(0.25)
+            
+            if await self.is_port_listening(self.socks_port[0]):
+                return True
+        return False
+    
+    async def read_auto_ports(self) -> bool:
+        """Non-blocking equivalent of TorHandler.read_auto_ports"""
+        monitor = self.tor_monitor
+        started_at = monitor.started_at if monitor else None
+        
+        expects_tcp_control = bool(self.tcp_ports(self.control_port))
+        
+        control_ports = []
+        if expects_tcp_control and await self.wait_for_path_async(self.control_port_file, 5, started_at):
+            control_ports = await asyncio.get_running_loop().run_in_executor(None, self.read_control_port_file)
+        if expects_tcp_control and not control_ports and monitor:
+            control_ports = self.parse_listener_ports(monitor.listeners.get('control', []))
+        if control_ports:
+            self.apply_auto_ports([], control_ports)
+        
+        socks_ports = []
+        if self.control_port and (control_ports or not expects_tcp_control):
+            await self.close_control_connection()
+            result = await self.send_control_commands("GETINFO net/listeners/socks", skip_wait=True)
+            if result and result[1]['reply'].is_ok:
+                socks_ports = self.parse_listener_ports(result[1]['reply'].values().get('net/listeners/socks', ''))
+        if not socks_ports and monitor:
+            socks_ports = self.parse_listener_ports(monitor.listeners.get('socks', []))
+        self.apply_auto_ports(socks_ports, [])
+        
+        if (self.tcp_ports(self.socks_port) and not socks_ports) or (expects_tcp_control and not control_ports):
+            self.logger("Could not read back auto ports", 2, func_id="F09C", error_code="E01")
+            return False
+        return True
+    
+    async def wait_for_path_async(self, path: Path, timeout: float, newer_than: Optional[float] = None) -> bool:
+        """Non-blocking equivalent of wait_for_path"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(timeout, 0)
+        while True:
+            try:
+                modified = path.stat().st_mtime
+                if newer_than is None or modified >= int(newer_than):
+                    return True
+            except FileNotFoundError:
+                pass
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.02)
+    
+    # ==================== TOR SERVICE LIFECYCLE ====================
+    async def monitor_tor_output_async(self, stream: asyncio.StreamReader, name: str = "stdout") -> None:
+        """Feed Tor's output to the monitor, keeping the pipe drained so Tor never blocks"""
+        monitor = self.tor_monitor
+        try:
+            while True:
+                line = await stream.readline()
+                if not line:
+                    break
+                if monitor.feed_line(line.decode('utf-8', errors='ignore').rstrip(), name):
+                    self.output_event.set()
+        finally:
+            if name == 'stdout':
+                monitor.mark_exited()
+                self.output_event.set()
+    
+    @instrumented("F33")
+    async def start_tor_service(self, seed_from: Optional[Path] = None) -> bool:
+        """Start the Tor service"""
+        if self.running:
+            self.logger("Tor already running", 1, func_id="F33")
+            return True
+        
+        try:
+            loop = asyncio.get_running_loop()
+            started = time.monotonic()
+            self.startup_timings = {}
+            self.reset_bootstrap_status()
+            await self.close_control_connection()
+            
+            # Stale process cleanup and a possible binary download are blocking
+            tor_path = await loop.run_in_executor(None, self.prepare_tor_launch, seed_from)
+            if not tor_path:
+                return False
+            self.startup_timings['prepare'] = round(time.monotonic() - started, 3)
+            
+            await loop.run_in_executor(None, self.release_port_sockets)
+            self.tor_process = await asyncio.create_subprocess_exec(
+                str(tor_path), "-f", str(self.torrc_file),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
+            )
+            self.tor_monitor = self.create_tor_monitor(started)
+            self.output_event = asyncio.Event()
+            self.output_task = asyncio.ensure_future(asyncio.gather(
+                self.monitor_tor_output_async(self.tor_process.stdout, 'stdout'),
+                self.monitor_tor_output_async(self.tor_process.stderr, 'stderr')
+            ))
+            await loop.run_in_executor(None, self.record_tor_process, self.tor_process.pid)
+            
+            ready = await self.wait_for_tor_ready(timeout=30)
+            await loop.run_in_executor(None, self.release_port_reservations)
+            
+            if ready:
+                self.running = True
+                if self.auto_ports:
+                    await self.read_auto_ports()
+                self.tor_monitor.mark("ready")
+                self.logger("Tor service started successfully | Status: Running | Ready: %ss", 0, func_id="F33", args=(self.tor_monitor.timings['ready'],))
+                
+                # Refresh hidden service details from disk once Tor has written them
+                if self.hidden_services:
+                    for service in self.hidden_services:
+                        await self.wait_for_path_async(Path(service["dir"]) / "hostname", 5)
+                    await loop.run_in_executor(None, self.refresh_all_hidden_services)
+                    self.tor_monitor.mark("hidden_services")
+                
+                return True
+            
+            if self.tor_monitor.exited:
+                try:
+                    await asyncio.wait_for(self.tor_process.wait(), 1)
+                except asyncio.TimeoutError:
+                    pass
+            
+            if self.tor_process.returncode is not None:
+                # Let the readers pick up whatever is left in the pipes
+                await asyncio.wait([self.output_task], timeout=1)
+                self.logger("Tor process exited immediately | Exit code: %s", 2, func_id="F33", error_code="E03", args=(self.tor_process.returncode,))
+                self.logger("Tor error output:\n" + "\n".join(self.tor_monitor.recent_lines), 2, func_id="F33")
+                return False
+            
+            self.logger("Tor startup timeout | Timeout: 30s", 2, func_id="F33", error_code="E04")
+            self.logger("Tor output | Output: %s", 2, func_id="F33", args=(' '.join(self.tor_monitor.recent_lines)[-200:],))
+            self.running = False
+            
+            try:
+                self.tor_process.terminate()
+                await asyncio.wait_for(self.tor_process.wait(), 5)
+            except Exception:
+                pass
+            
+            return False
+        except Exception as e:
+            if self.debug:
+                raise
+            await asyncio.get_running_loop().run_in_executor(None, self.release_port_reservations)
+            self.logger("Tor service start failed", 2, e, func_id="F33", error_code="E05")
+            return False
+    
+    @instrumented("F34")
+    async def stop_tor_service(self) -> bool:
+        """Stop the Tor service gracefully"""
+        if not self.running:
+            await asyncio.get_running_loop().run_in_executor(None, self.release_port_reservations)
+            self.logger("Tor not running", 1, func_id="F34")
+            return True
+        
+        try:
+            # Send SHUTDOWN command via control port
+            await self.send_control_commands("SIGNAL SHUTDOWN")
+            await self.close_event_subscriptions()
+            await self.close_control_connection()
+            
+            # SHUTDOWN makes a client exit right away; only terminate if it lingers
+            if self.tor_process is not None:
+                try:
+                    await asyncio.wait_for(self.tor_process.wait(), 2)
+                except asyncio.TimeoutError:
+                    pass
+            
+            # Terminate and clean up anything left behind
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.release_tor_process)
+            self.tor_process = None
+            
+            self.logger("Tor service stopped successfully | Status: Stopped", 0, func_id="F34")
+            return True
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Tor service stop failed", 2, e, func_id="F34", error_code="E01")
+            return False
+    
+    @instrumented("F36")
+    async def restart_tor_service(self) -> bool:
+        """Restart the Tor service"""
+        try:
+            self.logger("Restarting Tor service", 0, func_id="F36")
+            await self.stop_tor_service()
+            result = await self.start_tor_service()
+            
+            if result:
+                self.logger("Tor service restarted successfully", 0, func_id="F36")
+            else:
+                self.logger("Tor service restart failed", 2, func_id="F36", error_code="E01")
+            
+            return result
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Tor service restart failed", 2, e, func_id="F36", error_code="E02")
+            return False
+    
+    # ==================== RUNTIME PORT MANAGEMENT ====================
+    @instrumented("F14")
+    async def add_runtime_socks_port(self, socks_port: Optional[int] = None, temporary: bool = False, flags: Optional[Union[str, List[str]]] = None) -> Union[bool, Dict]:
+        """Add a SOCKS port at runtime without restarting Tor"""
+        if not self.running:
+            error = RuntimeError("Tor is not running. Start Tor first.")
+            if self.debug:
+                raise error
+            self.logger("Runtime operation blocked | Reason: Tor not running", 2, error, func_id="F14", error_code="E01")
+            return False
+        
+        flags = self.validate_socks_port_flags(flags, "F14")
+        if flags is None:
+            return False
+        
+        # Port probes, the /proc scan and lock files are blocking
+        loop = asyncio.get_running_loop()
+        socks_port = await loop.run_in_executor(None, self.resolve_runtime_port, socks_port, 19050, self.socks_port_collision_resolve, "SocksPort", "F14")
+        if not socks_port:
+            return False
+        
+        try:
+            current_response = await self.send_control_commands("GETCONF SocksPort", skip_wait=True)
+            if not current_response:
+                return False
+            
+            commands = self.build_runtime_port_commands("SocksPort", current_response, socks_port, temporary, flags)
+            await loop.run_in_executor(None, self.release_port_reservations, [socks_port])
+            result = await self.send_control_commands(commands, skip_wait=True)
+            if result:
+                self.temp_config['socks_port'].append(socks_port)
+                if flags:
+                    self.socks_port_flags[socks_port] = flags
+                self.logger("Runtime SocksPort added | Port: %s | Flags: %s | Temporary: %s", 0, func_id="F14", args=(socks_port, ' '.join(flags) or 'None', temporary))
+            return result
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Runtime SocksPort addition failed", 2, e, func_id="F14", error_code="E03")
+            return False
+        finally:
+            await loop.run_in_executor(None, self.release_port_reservations, [socks_port])
+    
+    @instrumented("F15")
+    async def add_runtime_control_port(self, control_port: Optional[int] = None, temporary: bool = False) -> Union[bool, Dict]:
+        """Add a Control port at runtime without restarting Tor"""
+        if not self.running:
+            error = RuntimeError("Tor is not running. Start Tor first.")
+            if self.debug:
+                raise error
+            self.logger("Runtime operation blocked | Reason: Tor not running", 2, error, func_id="F15", error_code="E01")
+            return False
+        
+        # Port probes, the /proc scan and lock files are blocking
+        loop = asyncio.get_running_loop()
+        control_port = await loop.run_in_executor(None, self.resolve_runtime_port, control_port, 19051, self.control_port_collision_resolve, "ControlPort", "F15")
+        if not control_port:
+            return False
+        
+        try:
+            current_response = await self.send_control_commands("GETCONF ControlPort", skip_wait=True)
+            if not current_response:
+                return False
+            
+            commands = self.build_runtime_port_commands("ControlPort", current_response, control_port, temporary)
+            await loop.run_in_executor(None, self.release_port_reservations, [control_port])
+            result = await self.send_control_commands(commands, skip_wait=True)
+            if result:
+                self.temp_config['control_port'].append(control_port)
+                self.logger("Runtime ControlPort added | Port: %s | Temporary: %s", 0, func_id="F15", args=(control_port, temporary))
+            return result
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Runtime ControlPort addition failed", 2, e, func_id="F15", error_code="E03")
+            return False
+        finally:
+            await loop.run_in_executor(None, self.release_port_reservations, [control_port])
+    
+    # ==================== HIDDEN SERVICES ====================
+    @instrumented("F22")
+    async def register_runtime_hidden_service(
+        self,
+        port: int,
+        target_port: Union[int, str],
+        pre_config: bool = False,
+        host: Optional[str] = None,
+        pk: Optional[bytes] = None,
+        sk: Optional[bytes] = None,
+        temporary: bool = False
+    ) -> Union[bool, Dict]:
+        """Add a hidden service at runtime without restarting Tor"""
+        if not self.running:
+            error = RuntimeError("Tor is not running. Start Tor first.")
+            if self.debug:
+                raise error
+            self.logger("Runtime operation blocked | Reason: Tor not running", 2, error, func_id="F22", error_code="E01")
+            return False
+        
+        # Check for port conflicts (port scans are blocking)
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self.is_port_in_use, port):
+            if self.hidden_service_port_collision_resolve:
+                new_port = await loop.run_in_executor(None, self.find_available_port, port + 1)
+                if not new_port:
+                    return False
+                self.logger("Runtime HiddenService port conflict resolved | Old: %s | New: %s", 1, func_id="F22", args=(port, new_port))
+                port = new_port
+            else:
+                error = ValueError(f"HiddenServicePort {port} is already in use")
+                if self.debug:
+                    raise error
+                self.logger("Runtime HiddenService port unavailable | Port: %s", 2, error, func_id="F22", error_code="E02", args=(port,))
+                return False
+        
+        try:
+            command = self.build_add_onion_command(port, target_port, pre_config, sk)
+            result = await self.send_control_commands(command, skip_wait=True)
+            
+            if result:
+                return self.record_runtime_hidden_service(result[1]['response'], port, target_port, temporary)
+            
+            return False
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Runtime HiddenService registration failed", 2, e, func_id="F22", error_code="E04")
+            return False
+    
+    @instrumented("F23")
+    async def remove_runtime_hidden_service(self, onion_address: str) -> bool:
+        """Remove a runtime hidden service
+        
+        Unlike the blocking version there is no fixed delay: ADD_ONION and DEL_ONION
+        are answered in order, so a received ADD_ONION reply means the service exists.
+        """
+        if not self.running:
+            error = RuntimeError("Tor is not running")
+            if self.debug:
+                raise error
+            self.logger("Runtime operation blocked | Reason: Tor not running", 2, error, func_id="F23", error_code="E01")
+            return False
+        
+        try:
+            # Normalize address
+            service_id = onion_address.replace('.onion', '')
+            result = await self.send_control_commands(f'DEL_ONION {service_id}', skip_wait=True)
+            if result:
+                reply = result[1]['reply']
+                self.logger("DEL_ONION response | ServiceID: %s... | Response: %s", 0, func_id="F23", args=(service_id[:20], reply.raw))
+                if reply.is_ok:
+                    self.record_runtime_hidden_service_removal(onion_address)
+                    return True
+                
+                self.logger("DEL_ONION error | Address: %s | Response: %s", 2, func_id="F23", error_code="E02", args=(onion_address, reply.raw))
+                return False
+            
+            self.logger("No response from DEL_ONION | Address: %s", 2, func_id="F23", error_code="E04", args=(onion_address,))
+            return False
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Runtime HiddenService removal failed", 2, e, func_id="F23", error_code="E05")
+            return False
@@ -0,0 +1,204 @@
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from pathlib import Path
+from typing import Optional, Dict, Tuple
+
+# TorHandler levels (0/1/2) to stdlib levels and the names written in the log
+LEVELS = {0: logging.INFO, 1: logging.WARNING, 2: logging.ERROR}
+LEVEL_NAMES = {logging.INFO: "INFO", logging.WARNING: "WARN", logging.ERROR: "ERROR"}
+
+# Applications can attach their own handlers here; records reach it (and the root
+# logger) only at levels it is enabled for
+DTOR_LOGGER = logging.getLogger("dtor")
+DTOR_LOGGER.addHandler(logging.NullHandler())
+
+
+class TorLogRecord(logging.LogRecord):
+    """LogRecord carrying dtor's func_id, error_code and exception
+    
+    dtor records identify their origin by func_id/error_code, so no source location
+    is looked up and pathname/lineno stay empty.
+    """
+    
+    def __init__(self, levelno: int, msg: str, args: Optional[tuple], exception: Optional[BaseException],
+                 func_id: str, error_code: str):
+        super().__init__("dtor", levelno, "", 0, msg, args, None)
+        self.func_id = func_id
+        self.error_code = error_code
+        self.exception = exception
+
+
+def make_log_record(level: int, message: str, args: tuple = (), exception: Optional[BaseException] = None,
+                    func_id: str = "", error_code: str = "") -> logging.LogRecord:
+    """Create a record without formatting it; ``message % args`` runs in the writer thread"""
+    return TorLogRecord(LEVELS.get(level, logging.INFO), message, args or None, exception, func_id, error_code)
+
+
+class TorLogFormatter(logging.Formatter):
+    """The classic single-line format:
+    [2024-01-01 12:00:00] [TorHandler] [ERROR] [F29] [E02] Message | Exception: Type: text
+    """
+    
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [time.strftime('[%Y-%m-%d %H:%M:%S]', time.localtime(record.created)), "[TorHandler]",
+                 f"[{LEVEL_NAMES.get(record.levelno, record.levelname)}]"]
+        func_id = getattr(record, 'func_id', '')
+        error_code = getattr(record, 'error_code', '')
+        if func_id:
+            parts.append(f"[{func_id}]")
+        if error_code:
+            parts.append(f"[{error_code}]")
+        parts.append(record.getMessage())
+        
+        exception = getattr(record, 'exception', None)
+        if exception is not None:
+            parts.append(f"| Exception: {type(exception).__name__}: {exception}")
+        return " ".join(parts)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': LEVEL_NAMES.get(record.levelno, record.levelname),
+            'func_id': getattr(record, 'func_id', ''),
+            'error_code': getattr(record, 'error_code', ''),
+            'message': record.getMessage()
+        }
+        exception = getattr(record, 'exception', None)
+        if exception is not None:
+            entry['exception'] = {'type': type(exception).__name__, 'message': str(exception)}
+        return json.dumps(entry)
+
+
+CONSOLE_FORMATTER = TorLogFormatter()
+
+
+class LoggerMixin:
+    """The ``logger`` method shared by TorHandler and TorPool
+    
+    Classes using it provide ``debug``, ``log_level``, ``log_file``, ``log_max_bytes``,
+    ``log_backup_count``, ``log_json`` and ``instrumentation`` attributes.
+    """
+    
+    def logger(self, message: str, level: int = 0, exception: Optional[Exception] = None, func_id: str = "", error_code: str = "",
+               args: tuple = ()):
+        """Structured logging function with consistent format
+        
+        Records are queued and written by a background thread (see log_lib), so a
+        call costs no file I/O; below ``log_level`` (and without debug) it returns
+        before building anything.
+        
+        Args:
+            message: Log message, optionally with %-style placeholders for ``args``
+            level: 0=INFO, 1=WARNING, 2=ERROR
+            exception: Optional exception object
+            func_id: Function identifier (e.g., "F01" for function 1)
+            error_code: Specific error code within function (e.g., "E01")
+            args: Values for the placeholders, formatted lazily in the writer thread
+        """
+        if error_code:
+            self.instrumentation.note_error(func_id, error_code)
+        if level < self.log_level and not self.debug:
+            return
+        
+        record = make_log_record(level, message, args, exception, func_id, error_code)
+        
+        # Console output if debug enabled
+        if self.debug:
+            print(CONSOLE_FORMATTER.format(record))
+        
+        # File output
+        if level >= self.log_level:
+            dispatch_log_record(record, self.log_file, self.log_max_bytes, self.log_backup_count, self.log_json)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that hands the record over as is
+    
+    The stdlib version formats the message in the calling thread; records here stay
+    in-process, so formatting is left entirely to the listener thread.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogBackend:
+    """A file behind a queue: callers enqueue records, one listener thread formats and writes"""
+    
+    def __init__(self, path: Path, max_bytes: int, backup_count: int, json_format: bool):
+        self.path = path
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        # Writes to the file only; dispatch_log_record forwards to "dtor" after a level check
+        self.logger = logging.getLogger(f"dtor.file.{len(BACKENDS)}")
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.file_handler: logging.Handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+            )
+        except OSError:
+            self.file_handler = logging.NullHandler()
+        self.file_handler.setFormatter(JsonLogFormatter() if json_format else TorLogFormatter())
+        
+        self.queue_handler = DeferredQueueHandler(self.queue)
+        self.logger.addHandler(self.queue_handler)
+        self.listener = logging.handlers.QueueListener(self.queue, self.file_handler)
+        self.listener.start()
+    
+    def stop(self) -> None:
+        """Write out everything queued and close the file"""
+        self.listener.stop()
+        self.logger.removeHandler(self.queue_handler)
+        self.file_handler.close()
+
+
+BACKENDS: Dict[Tuple, LogBackend] = {}
+BACKENDS_LOCK = threading.Lock()
+
+
+def get_log_backend(path: Path, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                    json_format: bool = False) -> logging.Logger:
+    """Return the stdlib logger writing to ``path``, shared by every handler using that file"""
+    key = (str(path), max_bytes, backup_count, json_format)
+    backend = BACKENDS.get(key)
+    if backend is None:
+        with BACKENDS_LOCK:
+            backend = BACKENDS.get(key)
+            if backend is None:
+                backend = BACKENDS[key] = LogBackend(Path(path), max_bytes, backup_count, json_format)
+    return backend.logger
+
+
+def dispatch_log_record(record: logging.LogRecord, path: Path, max_bytes: int = 10 * 1024 * 1024,
+                        backup_count: int = 5, json_format: bool = False) -> None:
+    """Queue ``record`` for the file at ``path`` and pass it to the "dtor" logger if enabled there
+    
+    Logger.handle() skips level checks, so the application's logging configuration
+    (e.g. basicConfig(level=WARNING)) is honoured here explicitly.
+    """
+    get_log_backend(path, max_bytes, backup_count, json_format).handle(record)
+    if DTOR_LOGGER.isEnabledFor(record.levelno):
+        DTOR_LOGGER.handle(record)
+
+
+def flush_logs() -> None:
+    """Write out all queued log records (backends restart on the next log call)"""
+    with BACKENDS_LOCK:
+        backends = list(BACKENDS.values())
+        BACKENDS.clear()
+    for backend in backends:
+        backend.stop()
+
+
+atexit.register(flush_logs)
@@ -0,0 +1,304 @@
+import time
+import threading
+import http.server
+from typing import Optional, Dict, List, Tuple, Union, Callable
+
+import psutil
+
+from .tor_lib import TorHandler
+from .trace_lib import Instrumentation
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Family name -> (type, help); counters get the "_total" suffix on their samples
+METRIC_FAMILIES = {
+    'tor_up': ('gauge', "Whether the Tor instance is running"),
+    'tor_bootstrap_percent': ('gauge', "Bootstrap progress reported by Tor"),
+    'tor_traffic_read_bytes': ('counter', "Bytes read by Tor (GETINFO traffic/read)"),
+    'tor_traffic_written_bytes': ('counter', "Bytes written by Tor (GETINFO traffic/written)"),
+    'tor_circuits': ('gauge', "Circuits by status (GETINFO circuit-status)"),
+    'tor_hidden_services': ('gauge', "Hidden services managed by dtor"),
+    'tor_process_resident_memory_bytes': ('gauge', "Resident memory of the Tor process"),
+    'tor_process_cpu_seconds': ('counter', "User and system CPU time of the Tor process"),
+    'tor_log_messages': ('counter', "Lines Tor has logged, by severity"),
+    'dtor_control_commands': ('counter', "Control commands sent by dtor, by keyword"),
+    'dtor_control_command_errors': ('counter', "Control commands that failed or got an error reply"),
+    'dtor_control_command_seconds': ('summary', "Control command round-trip time"),
+    'dtor_operation_seconds': ('histogram', "Duration of instrumented dtor operations, by func_id"),
+    'dtor_operations': ('counter', "Instrumented dtor operations, by func_id and outcome"),
+    'dtor_operation_errors': ('counter', "Error codes reported by instrumented dtor operations"),
+    'dtor_metrics_collection_seconds': ('gauge', "Time taken by the last metrics collection"),
+}
+
+# Upper bounds (seconds) of the exported operation histogram buckets
+OPERATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_metric_value(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def render_openmetrics(samples: Dict[str, List[Sample]]) -> bytes:
+    """Render samples grouped by family in the OpenMetrics text format"""
+    lines = []
+    for family, (metric_type, help_text) in METRIC_FAMILIES.items():
+        family_samples = samples.get(family)
+        if not family_samples:
+            continue
+        lines.append(f"# TYPE {family} {metric_type}")
+        lines.append(f"# HELP {family} {help_text}")
+        for name, labels, value in family_samples:
+            label_text = ",".join(f'{key}="{escape_label_value(str(label))}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {format_metric_value(value)}" if label_text else f"{name} {format_metric_value(value)}")
+    lines.append("# EOF")
+    return ("\n".join(lines) + "\n").encode()
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the exporter's last collected page; scrapes never touch Tor"""
+    
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.exporter.metrics_page
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class TorMetricsExporter:
+    """Collects Tor and dtor metrics in the background and serves them over HTTP
+    
+    A collector thread polls every ``interval`` seconds: one GETINFO round trip per
+    running instance (traffic, circuits, bootstrap phase), psutil for the process,
+    and dtor's own counters. Scrapes are answered from the last collected page, so
+    frequent scrapes add no load on Tor.
+    
+    Example:
+        exporter = TorMetricsExporter.for_pool(pool, listen_port=9099)
+        exporter.start()
+        # scrape http://127.0.0.1:9099/metrics
+        exporter.stop()
+    """
+    
+    def __init__(self, handlers: Union[List[TorHandler], Callable[[], List[TorHandler]]],
+                 listen_host: str = "127.0.0.1", listen_port: int = 9099, interval: float = 15, logger=None,
+                 pool_instrumentation: Optional[Instrumentation] = None):
+        """
+        Args:
+            handlers: TorHandlers to collect from, or a callable returning the current list
+            listen_host: Address to listen on
+            listen_port: Port to listen on (0 picks a free port)
+            interval: Seconds between collections
+            logger: Optional TorHandler-style logger
+            pool_instrumentation: Optional TorPool instrumentation, exported as instance "pool"
+        """
+        self.handler_source = handlers
+        self.pool_instrumentation = pool_instrumentation
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.interval = interval
+        self.logger = logger
+        
+        self.metrics_page = render_openmetrics({})
+        self.processes: Dict[int, psutil.Process] = {}
+        self.server: Optional[http.server.ThreadingHTTPServer] = None
+        self.server_thread: Optional[threading.Thread] = None
+        self.collector_thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+    
+    @classmethod
+    def for_handler(cls, handler: TorHandler, **kwargs) -> "TorMetricsExporter":
+        """Exporter for a single TorHandler (or AsyncTorHandler)"""
+        return cls([handler], logger=handler.logger, **kwargs)
+    
+    @classmethod
+    def for_pool(cls, pool, **kwargs) -> "TorMetricsExporter":
+        """Exporter for every instance of a TorPool, labelled by instance index"""
+        return cls(lambda: pool.instances, logger=pool.logger, pool_instrumentation=pool.instrumentation, **kwargs)
+    
+    def log(self, message: str, level: int = 0, exception: Optional[Exception] = None, error_code: str = "",
+            args: tuple = ()) -> None:
+        if self.logger:
+            self.logger(message, level, exception, func_id="F52", error_code=error_code, args=args)
+    
+    # ==================== COLLECTION ====================
+    def query_tor(self, handler: TorHandler) -> Dict[str, str]:
+        """GETINFO traffic, circuits and bootstrap phase in one round trip"""
+        # The blocking implementation works for AsyncTorHandler too, on its own pooled connection
+        result = TorHandler.send_control_commands(
+            handler, "GETINFO traffic/read traffic/written circuit-status status/bootstrap-phase", skip_wait=True
+        )
+        if not result or not result[1]['reply'].is_ok:
+            return {}
+        return result[1]['reply'].values()
+    
+    def get_process(self, handler: TorHandler) -> Optional[psutil.Process]:
+        """psutil handle for the instance's Tor process, kept across collections"""
+        pid = handler.tor_process_id
+        process = self.processes.get(pid)
+        if process is None or not process.is_running():
+            process = handler.get_tor_process()
+            if process is None:
+                return None
+            self.processes[process.pid] = process
+        return process
+    
+    def collect_operations(self, instrumentation: Instrumentation, instance: str, samples: Dict[str, List[Sample]]) -> None:
+        """Operation histograms, outcome and error code counters of one instrumentation"""
+        histograms = instrumentation.get_histograms()
+        for func_id, stats in instrumentation.get_stats().items():
+            name, histogram = histograms[func_id]
+            labels = {'instance': instance, 'func_id': func_id, 'operation': name}
+            family = samples.setdefault('dtor_operation_seconds', [])
+            for bound in OPERATION_BUCKETS:
+                family.append(('dtor_operation_seconds_bucket', dict(labels, le=repr(bound)), histogram.count_at_or_below(bound)))
+            family.append(('dtor_operation_seconds_bucket', dict(labels, le="+Inf"), histogram.count))
+            family.append(('dtor_operation_seconds_count', labels, histogram.count))
+            family.append(('dtor_operation_seconds_sum', labels, round(histogram.total, 6)))
+            
+            for outcome, count in stats['outcomes'].items():
+                samples.setdefault('dtor_operations', []).append(('dtor_operations_total', dict(labels, outcome=outcome), count))
+            for error_code, count in sorted(stats['error_codes'].items()):
+                samples.setdefault('dtor_operation_errors', []).append(('dtor_operation_errors_total', dict(labels, error_code=error_code), count))
+    
+    def collect_handler(self, handler: TorHandler, instance: str, samples: Dict[str, List[Sample]]) -> None:
+        labels = {'instance': instance}
+        
+        def add(family: str, value: float, suffix: str = "", **extra_labels) -> None:
+            samples.setdefault(family, []).append((family + suffix, dict(labels, **extra_labels), value))
+        
+        add('tor_up', 1 if handler.running else 0)
+        add('tor_hidden_services', len(handler.hidden_services), kind="persistent")
+        add('tor_hidden_services', len(handler.temp_config['hidden_services']), kind="runtime")
+        
+        for severity, count in handler.get_tor_log_counts().items():
+            add('tor_log_messages', count, "_total", severity=severity)
+        
+        for keyword, stats in sorted(handler.get_control_command_stats().items()):
+            add('dtor_control_commands', stats['count'], "_total", command=keyword)
+            add('dtor_control_command_errors', stats['errors'], "_total", command=keyword)
+            add('dtor_control_command_seconds', stats['count'], "_count", command=keyword)
+            add('dtor_control_command_seconds', stats['seconds'], "_sum", command=keyword)
+        
+        self.collect_operations(handler.instrumentation, instance, samples)
+        
+        if not handler.running:
+            return
+        
+        values = self.query_tor(handler)
+        if values:
+            add('tor_traffic_read_bytes', int(values.get('traffic/read', 0) or 0), "_total")
+            add('tor_traffic_written_bytes', int(values.get('traffic/written', 0) or 0), "_total")
+            
+            circuits: Dict[str, int] = {}
+            for line in values.get('circuit-status', '').splitlines():
+                parts = line.split()
+                if len(parts) >= 2:
+                    circuits[parts[1]] = circuits.get(parts[1], 0) + 1
+            for status in ('LAUNCHED', 'BUILT', 'EXTENDED', 'GUARD_WAIT', 'FAILED', 'CLOSED'):
+                add('tor_circuits', circuits.pop(status, 0), status=status)
+            for status, count in circuits.items():
+                add('tor_circuits', count, status=status)
+            
+            phase = handler.parse_bootstrap_phase(values.get('status/bootstrap-phase', ''))
+            if phase:
+                handler.update_bootstrap_status(*phase, 'getinfo')
+        add('tor_bootstrap_percent', handler.get_bootstrap_status()['percent'])
+        
+        process = self.get_process(handler)
+        if process is not None:
+            try:
+                with process.oneshot():
+                    cpu = process.cpu_times()
+                    add('tor_process_resident_memory_bytes', process.memory_info().rss)
+                    add('tor_process_cpu_seconds', round(cpu.user + cpu.system, 3), "_total")
+            except psutil.Error:
+                self.processes.pop(process.pid, None)
+    
+    def collect(self) -> bytes:
+        """Collect from every handler now and return the rendered page"""
+        started = time.perf_counter()
+        handlers = self.handler_source() if callable(self.handler_source) else self.handler_source
+        samples: Dict[str, List[Sample]] = {}
+        
+        for index, handler in enumerate(handlers):
+            try:
+                self.collect_handler(handler, str(index), samples)
+            except Exception as e:
+                if getattr(handler, 'debug', False):
+                    raise
+                self.log("Metrics collection failed | Instance: %s", 1, e, error_code="E01", args=(index,))
+        
+        if self.pool_instrumentation is not None:
+            self.collect_operations(self.pool_instrumentation, "pool", samples)
+        
+        samples['dtor_metrics_collection_seconds'] = [
+            ('dtor_metrics_collection_seconds', {}, round(time.perf_counter() - started, 6))
+        ]
+        self.metrics_page = render_openmetrics(samples)
+        return self.metrics_page
+    
+    def get_metrics_text(self) -> str:
+        """Return the last collected page"""
+        return self.metrics_page.decode()
+    
+    def collect_loop(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            self.collect()
+    
+    # ==================== LIFECYCLE ====================
+    def start(self) -> bool:
+        """Collect once, then serve /metrics and keep collecting in background threads"""
+        try:
+            self.collect()
+            self.server = http.server.ThreadingHTTPServer((self.listen_host, self.listen_port), MetricsRequestHandler)
+            self.server.daemon_threads = True
+            self.server.exporter = self
+            self.listen_port = self.server.server_address[1]
+            
+            self.stop_event.clear()
+            self.server_thread = threading.Thread(target=self.server.serve_forever, name="dtor-metrics-http", daemon=True)
+            self.collector_thread = threading.Thread(target=self.collect_loop, name="dtor-metrics-collector", daemon=True)
+            self.server_thread.start()
+            self.collector_thread.start()
+            self.log("Metrics exporter listening | Address: %s:%s | Interval: %ss", args=(self.listen_host, self.listen_port, self.interval))
+            return True
+        except Exception as e:
+            self.log("Metrics exporter failed to start | Address: %s:%s", 2, e, error_code="E02", args=(self.listen_host, self.listen_port))
+            return False
+    
+    def stop(self) -> None:
+        """Stop serving and collecting"""
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in (self.server_thread, self.collector_thread):
+            if thread is not None:
+                thread.join(timeout=10)
+        self.server_thread = self.collector_thread = None
+        self.processes.clear()
+        self.log("Metrics exporter stopped")
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,362 @@
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+from .tor_lib import TorHandler, get_cache_dir
+from .log_lib import LoggerMixin
+from .trace_lib import Instrumentation, instrumented
+
+
+class TorPool(LoggerMixin):
+    """Launches and supervises several isolated Tor instances sharing one binary
+    
+    Each instance is a TorHandler with its own base directory (torrc, DataDirectory,
+    PID file and process registry) and its own SocksPort/ControlPort. The binary and
+    download cache live once in the pool's base directory.
+    """
+    
+    def __init__(self, size: int = 2, base_dir=None, recover: bool = True,
+                 socks_start_port: int = 9050, control_start_port: Optional[int] = None,
+                 handler_class=TorHandler):
+        """Create the pool's instances and assign their ports
+        
+        Args:
+            size: Number of Tor instances
+            base_dir: Pool directory (defaults to ~/.cache/tor/pool)
+            recover: Reuse each instance's saved torrc (and ports) when present
+            socks_start_port: First port to try for SocksPorts
+            control_start_port: First port to try for ControlPorts (defaults after the SOCKS range)
+            handler_class: TorHandler subclass used for the instances
+        """
+        self.debug = False
+        self.log_level = 0
+        self.install_source = None  # see TorHandler.install_source
+        self.allow_unverified_install = False
+        
+        self.base_dir = get_cache_dir() / "pool" if base_dir is None else Path(base_dir).resolve()
+        self.log_file = Path(self.base_dir, "logs", "tor_handler.log")
+        self.log_max_bytes = 10 * 1024 * 1024
+        self.log_backup_count = 5
+        self.log_json = False
+        self.instrumentation = Instrumentation(self.logger)
+        self.binary_dir = Path(self.base_dir, "tor_binaries")
+        self.cache_directory = Path(self.base_dir, "cache")
+        self.binary_store = Path(self.base_dir, "tor_store")
+        self.seed_directory = Path(self.base_dir, "seed")
+        
+        self.lock = threading.Condition()
+        self.leases: Dict[int, int] = {}
+        self.draining: set = set()
+        self.round_robin_cursor = 0
+        self.unassigned: set = set()  # instances left without free ports; never started
+        
+        self.instances: List[TorHandler] = []
+        for index in range(size):
+            handler = handler_class(recover=recover, backup_dir=Path(self.base_dir, f"instance_{index}"))
+            
+            # Share the binary store and download cache; DataDirectory stays per instance
+            handler.binary_dir = self.binary_dir
+            handler.cache_directory = self.cache_directory
+            handler.binary_store = self.binary_store
+            handler.manifest_cache_file = Path(self.cache_directory, "tor_versions.json")
+            self.instances.append(handler)
+            self.leases[index] = 0
+        
+        self.assign_ports(socks_start_port, control_start_port or socks_start_port + 2 * size + 1)
+    
+    # ==================== INSTANCE SETUP ====================
+    def assign_ports(self, socks_start_port: int, control_start_port: int) -> None:
+        """Give every instance its own free SocksPort and ControlPort, keeping recovered ones
+        
+        An instance for which no free pair is found is recorded in ``unassigned``
+        rather than left on its default ports; ``start`` refuses to run such a pool.
+        """
+        used: set = set()
+        socks_cursor, control_cursor = socks_start_port, control_start_port
+        
+        for index, handler in enumerate(self.instances):
+            recovered = handler.socks_port[:1] + handler.control_port[:1]
+            conflicts = handler.conflicting_ports.get('socks_port', []) + handler.conflicting_ports.get('control_port', [])
+            if handler.torrc_file.exists() and len(recovered) == 2 and not used.intersection(recovered) and not conflicts:
+                used.update(recovered)
+                continue
+            
+            socks_port = handler.find_available_port(socks_cursor, exclude=list(used))
+            control_port = handler.find_available_port(control_cursor, exclude=list(used) + [socks_port])
+            if not socks_port or not control_port:
+                self.unassigned.add(index)
+                self.logger("Pool instance has no free ports | Index: %s | SocksPort from: %s | ControlPort from: %s", 2, func_id="F44", error_code="E04", args=(index, socks_cursor, control_cursor))
+                continue
+            used.update((socks_port, control_port))
+            socks_cursor, control_cursor = socks_port + 1, control_port + 1
+            
+            handler.socks_port = [socks_port]
+            handler.control_port = [control_port]
+            handler.save_torrc_configuration()
+            self.logger("Pool instance configured | Index: %s | SocksPort: %s | ControlPort: %s", 0, func_id="F44", args=(index, socks_port, control_port))
+    
+    def ensure_binaries(self) -> bool:
+        """Download the shared Tor binary once, before instances start in parallel"""
+        if str(self.install_source) == "system":
+            return all(handler.use_system_tor() for handler in self.instances)
+        
+        handler = self.instances[0]
+        if handler.get_tor_executable_path().exists():
+            return True
+        handler.allow_unverified_install = self.allow_unverified_install
+        return handler.download_and_install_tor_binaries(source=self.install_source)
+    
+    def has_seed_cache(self) -> bool:
+        return Path(self.seed_directory, "cached-microdesc-consensus").exists() or Path(self.seed_directory, "cached-consensus").exists()
+    
+    def update_seed_cache(self, index: Optional[int] = None) -> bool:
+        """Snapshot a bootstrapped instance's consensus and descriptor caches into the seed directory
+        
+        Args:
+            index: Instance to snapshot (defaults to the first fully bootstrapped one)
+        """
+        try:
+            if index is None:
+                index = next((i for i, handler in enumerate(self.instances)
+                              if handler.running and handler.get_bootstrap_status()['percent'] >= 100), None)
+                if index is None:
+                    self.logger("Seed cache not updated | Reason: No bootstrapped instance", 1, func_id="F48")
+                    return False
+            
+            handler = self.instances[index]
+            self.seed_directory.mkdir(parents=True, exist_ok=True)
+            updated = []
+            for name in handler.SEED_LINK_FILES + handler.SEED_COPY_FILES:
+                source = handler.data_directory / name
+                if source.is_file():
+                    handler.link_or_copy(source, self.seed_directory / name, link=name in handler.SEED_LINK_FILES)
+                    updated.append(name)
+            
+            self.logger("Seed cache updated | Index: %s | Files: %s", 0, func_id="F48", args=(index, ', '.join(updated) or 'none'))
+            return bool(updated)
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Seed cache update failed", 2, e, func_id="F48", error_code="E03")
+            return False
+    
+    # ==================== POOL LIFECYCLE ====================
+    @instrumented("F44")
+    def start(self, bootstrap_timeout: Optional[float] = None, seed: bool = True) -> bool:
+        """Start all instances in parallel
+        
+        With ``seed``, instances start from the pool's seed cache of consensus and
+        descriptor files instead of bootstrapping from scratch. If there is no seed
+        cache yet and ``bootstrap_timeout`` is set, one instance bootstraps first and
+        the others are seeded from it.
+        
+        Args:
+            bootstrap_timeout: If set, also wait for each instance to fully bootstrap
+            seed: Seed each DataDirectory from the shared cache
+        
+        Returns:
+            True if every instance started (and bootstrapped, if requested)
+        """
+        try:
+            if self.unassigned:
+                self.logger("Pool start failed | Reason: no free ports for instances %s", 2, func_id="F44", error_code="E04", args=(sorted(self.unassigned),))
+                return False
+            
+            if not self.ensure_binaries():
+                self.logger("Pool start failed | Reason: Tor binary unavailable", 2, func_id="F44", error_code="E01")
+                return False
+            
+            seed_from = self.seed_directory if seed and self.has_seed_cache() else None
+            
+            def start_instance(handler: TorHandler) -> bool:
+                if not handler.start_tor_service(seed_from=seed_from):
+                    return False
+                if bootstrap_timeout is not None:
+                    return handler.wait_for_bootstrap(timeout=bootstrap_timeout)
+                return True
+            
+            started = time.monotonic()
+            results = []
+            pending = self.instances
+            
+            if seed and seed_from is None and bootstrap_timeout is not None and len(self.instances) > 1:
+                results.append(start_instance(self.instances[0]))
+                pending = self.instances[1:]
+                if results[0] and self.update_seed_cache(0):
+                    seed_from = self.seed_directory
+            
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                results.extend(executor.map(start_instance, pending))
+            
+            # Keep the seed cache fresh for the next start
+            if seed and bootstrap_timeout is not None and any(results):
+                self.update_seed_cache()
+            
+            self.logger("Pool started | Instances: %s/%s | Elapsed: %.2fs", 0 if all(results) else 2, func_id="F44", error_code="" if all(results) else "E02", args=(sum(results), len(results), time.monotonic() - started))
+            return all(results)
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Pool start failed", 2, e, func_id="F44", error_code="E03")
+            return False
+    
+    @instrumented("F45")
+    def stop(self) -> bool:
+        """Stop all instances in parallel"""
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.instances)) as executor:
+                results = list(executor.map(lambda handler: handler.stop_tor_service(), self.instances))
+            self.logger("Pool stopped | Instances: %s", 0, func_id="F45", args=(len(results),))
+            return all(results)
+        except Exception as e:
+            if self.debug:
+                raise
+            self.logger("Pool stop failed", 2, e, func_id="F45", error_code="E01")
+            return False
+    
+    @instrumented("F46")
+    def rolling_restart(self, drain_timeout: float = 30, bootstrap_timeout: Optional[float] = None) -> bool:
+        """Restart instances one at a time so the rest of the pool keeps serving
+        
+        Each instance stops receiving new leases, waits for its active leases to be
+        released (up to drain_timeout), restarts and rejoins the rotation.
+        """
+        success = True
+        for index, handler in enumerate(self.instances):
+            if index in self.unassigned:
+                continue
+            with self.lock:
+                self.draining.add(index)
+                self.lock.wait_for(lambda: self.leases[index] == 0, drain_timeout)
+            try:
+                self.logger("Rolling restart | Index: %s | Active leases: %s", 0, func_id="F46", args=(index, self.leases[index]))
+                restarted = handler.restart_tor_service()
+                if restarted and bootstrap_timeout is not None:
+                    restarted = handler.wait_for_bootstrap(timeout=bootstrap_timeout)
+                if not restarted:
+                    self.logger("Rolling restart failed | Index: %s", 2, func_id="F46", error_code="E01", args=(index,))
+                    success = False
+            except Exception as e:
+                if self.debug:
+                    raise
+                self.logger("Rolling restart failed | Index: %s", 2, e, func_id="F46", error_code="E02", args=(index,))
+                success = False
+            finally:
+                with self.lock:
+                    self.draining.discard(index)
+        return success
+    
+    def restart_failed_instances(self) -> List[int]:
+        """Restart instances whose Tor process has died; returns their indexes"""
+        restarted = []
+        for index, handler in enumerate(self.instances):
+            if handler.running and handler.get_tor_process() is None:
+                self.logger("Pool instance died, restarting | Index: %s", 1, func_id="F46", args=(index,))
+                handler.running = False
+                if handler.start_tor_service():
+                    restarted.append(index)
+        return restarted
+    
+    # ==================== ENDPOINT SELECTION ====================
+    def available_instances(self) -> List[int]:
+        return [index for index, handler in enumerate(self.instances)
+                if handler.running and handler.socks_port and index not in self.draining]
+    
+    def select_instance(self, strategy: str = "round_robin") -> Optional[int]:
+        """Pick a serving instance by "round_robin" or "least_loaded" (fewest active leases)"""
+        with self.lock:
+            candidates = self.available_instances()
+            if not candidates:
+                return None
+            if strategy == "least_loaded":
+                return min(candidates, key=lambda index: (self.leases[index], (index - self.round_robin_cursor) % len(self.instances)))
+            if strategy != "round_robin":
+                raise ValueError(f"Unknown selection strategy: {strategy}")
+            
+            for offset in range(len(self.instances)):
+                index = (self.round_robin_cursor + offset) % len(self.instances)
+                if index in candidates:
+                    self.round_robin_cursor = index + 1
+                    return index
+            return None
+    
+    def get_socks_endpoints(self) -> List[Tuple[str, int]]:
+        """SOCKS endpoints of every serving instance"""
+        with self.lock:
+            return [("127.0.0.1", self.instances[index].socks_port[0]) for index in self.available_instances()]
+    
+    def get_socks_endpoint(self, strategy: str = "round_robin") -> Optional[Tuple[str, int]]:
+        """Return a ("127.0.0.1", port) SOCKS endpoint without tracking its use"""
+        index = self.select_instance(strategy)
+        if index is None:
+            self.logger("No pool instance available", 1, func_id="F47")
+            return None
+        return "127.0.0.1", self.instances[index].socks_port[0]
+    
+    def acquire_endpoint(self, strategy: str = "least_loaded") -> Optional[Tuple[str, int]]:
+        """Lease a SOCKS endpoint; pair with release_endpoint (or use lease())"""
+        index = self.select_instance(strategy)
+        if index is None:
+            self.logger("No pool instance available", 1, func_id="F47")
+            return None
+        with self.lock:
+            self.leases[index] += 1
+        return "127.0.0.1", self.instances[index].socks_port[0]
+    
+    def release_endpoint(self, endpoint: Tuple[str, int]) -> None:
+        with self.lock:
+            for index, handler in enumerate(self.instances):
+                if endpoint[1] in handler.socks_port and self.leases[index] > 0:
+                    self.leases[index] -= 1
+                    self.lock.notify_all()
+                    return
+    
+    @contextmanager
+    def lease(self, strategy: str = "least_loaded"):
+        """Context manager yielding a leased SOCKS endpoint (None if nothing is serving)"""
+        endpoint = self.acquire_endpoint(strategy)
+        try:
+            yield endpoint
+        finally:
+            if endpoint is not None:
+                self.release_endpoint(endpoint)
+    
+    # ==================== STATUS ====================
+    def get_status(self) -> Dict:
+        """Aggregate status of the pool and each instance"""
+        instances = []
+        for index, handler in enumerate(self.instances):
+            bootstrap = handler.get_bootstrap_status()
+            tor_log_counts = handler.get_tor_log_counts()
+            instances.append({
+                'index': index,
+                'running': handler.running,
+                'pid': handler.tor_process_id,
+                'socks_port': handler.socks_port,
+                'control_port': handler.control_port,
+                'bootstrap_percent': bootstrap['percent'],
+                'tor_warnings': tor_log_counts['warn'],
+                'tor_errors': tor_log_counts['err'],
+                'active_leases': self.leases[index],
+                'draining': index in self.draining
+            })
+        
+        return {
+            'size': len(self.instances),
+            'running': sum(1 for instance in instances if instance['running']),
+            'bootstrapped': sum(1 for instance in instances if instance['bootstrap_percent'] >= 100),
+            'active_leases': sum(self.leases.values()),
+            'socks_endpoints': [("127.0.0.1", instance['socks_port'][0]) for instance in instances
+                                if instance['running'] and instance['socks_port']],
+            'instances': instances
+        }
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
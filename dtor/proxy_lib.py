@@ -0,0 +1,261 @@
+import time
+import asyncio
+import threading
+from typing import Optional, Dict, List, Tuple, Union, Callable
+
+Endpoint = Tuple[str, int]
+
+
+class SocksBackend:
+    """A Tor SocksPort behind the front proxy, with its connection counters and health"""
+    
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.active = 0
+        self.total = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retry_at = 0.0
+    
+    @property
+    def endpoint(self) -> Endpoint:
+        return self.host, self.port
+    
+    @property
+    def healthy(self) -> bool:
+        return self.consecutive_failures == 0 or time.monotonic() >= self.retry_at
+    
+    def mark_failure(self, retry_after: float) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        # Back off longer the more often a backend keeps failing
+        self.retry_at = time.monotonic() + retry_after * min(self.consecutive_failures, 10)
+    
+    def mark_success(self) -> None:
+        self.consecutive_failures = 0
+        self.retry_at = 0.0
+    
+    def get_stats(self) -> Dict:
+        return {
+            'endpoint': f"{self.host}:{self.port}",
+            'healthy': self.healthy,
+            'active': self.active,
+            'total': self.total,
+            'failures': self.failures,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received
+        }
+
+
+class SocksFrontProxy:
+    """Single SOCKS5 listener that spreads client connections over several Tor SocksPorts
+    
+    Connections are relayed byte-for-byte, so the SOCKS handshake (including any
+    username/password used for stream isolation) is handled by Tor itself. Each new
+    connection goes to the healthy backend with the fewest active connections; a
+    backend that refuses connections is skipped for a back-off period.
+    
+    Example:
+        proxy = SocksFrontProxy.for_pool(pool, listen_port=9060)
+        proxy.start_in_thread()
+        # clients use socks5h://127.0.0.1:9060
+        proxy.stop()
+    """
+    
+    def __init__(self, backends: Union[List[Endpoint], Callable[[], List[Endpoint]]],
+                 listen_host: str = "127.0.0.1", listen_port: int = 9060,
+                 connect_timeout: float = 10, retry_after: float = 5, logger=None):
+        """
+        Args:
+            backends: List of (host, port) SocksPorts, or a callable returning the current list
+            listen_host: Address to listen on
+            listen_port: Port to listen on (0 picks a free port)
+            connect_timeout: Seconds to wait when connecting to a backend
+            retry_after: Base back-off in seconds before retrying a failed backend
+            logger: Optional TorHandler-style logger
+        """
+        self.backend_source = backends
+        self.backends: Dict[Endpoint, SocksBackend] = {}
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.connect_timeout = connect_timeout
+        self.retry_after = retry_after
+        self.logger = logger
+        
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.client_tasks: set = set()
+        self.total_connections = 0
+        self.rejected_connections = 0
+    
+    @classmethod
+    def for_handler(cls, handler, **kwargs) -> "SocksFrontProxy":
+        """Front proxy over all TCP SocksPorts of one TorHandler"""
+        return cls(lambda: [("127.0.0.1", port) for port in handler.tcp_ports(handler.socks_port)] if handler.running else [],
+                   logger=handler.logger, **kwargs)
+    
+    @classmethod
+    def for_pool(cls, pool, **kwargs) -> "SocksFrontProxy":
+        """Front proxy over every serving instance of a TorPool (draining instances are skipped)"""
+        return cls(pool.get_socks_endpoints, logger=pool.logger, **kwargs)
+    
+    def log(self, message: str, level: int = 0, exception: Optional[Exception] = None, error_code: str = "",
+            args: tuple = ()) -> None:
+        if self.logger:
+            self.logger(message, level, exception, func_id="F49", error_code=error_code, args=args)
+    
+    # ==================== BACKEND SELECTION ====================
+    def current_backends(self) -> List[SocksBackend]:
+        """Backends for the current endpoint list, keeping counters for known ones"""
+        endpoints = self.backend_source() if callable(self.backend_source) else self.backend_source
+        backends = []
+        for host, port in endpoints:
+            backend = self.backends.get((host, port))
+            if backend is None:
+                backend = self.backends[(host, port)] = SocksBackend(host, port)
+            backends.append(backend)
+        return backends
+    
+    def select_backends(self) -> List[SocksBackend]:
+        """Backends in the order to try them: healthy ones by fewest active connections first"""
+        backends = self.current_backends()
+        return sorted(backends, key=lambda backend: (not backend.healthy, backend.active, backend.total))
+    
+    async def connect_backend(self) -> Tuple[Optional[SocksBackend], Optional[asyncio.StreamReader], Optional[asyncio.StreamWriter]]:
+        for backend in self.select_backends():
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(backend.host, backend.port), self.connect_timeout)
+                backend.mark_success()
+                return backend, reader, writer
+            except (OSError, asyncio.TimeoutError) as e:
+                backend.mark_failure(self.retry_after)
+                self.log("SOCKS backend unavailable | Backend: %s:%s | Failures: %s", 1, e, args=(backend.host, backend.port, backend.consecutive_failures))
+        return None, None, None
+    
+    # ==================== RELAY ====================
+    async def pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, peer_writer: asyncio.StreamWriter,
+                   backend: SocksBackend, upstream: bool) -> None:
+        """Copy one direction of a relayed connection
+        
+        EOF is passed on as a half-close so the other direction can finish. An error
+        closes both connections (``writer`` and ``peer_writer``, the writer paired
+        with ``reader``), so the other direction's read ends too instead of waiting.
+        """
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                if upstream:
+                    backend.bytes_sent += len(data)
+                else:
+                    backend.bytes_received += len(data)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (OSError, ConnectionError):
+            for stream_writer in (writer, peer_writer):
+                stream_writer.close()
+    
+    async def handle_client(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        self.total_connections += 1
+        backend, backend_reader, backend_writer = await self.connect_backend()
+        if backend is None:
+            self.rejected_connections += 1
+            self.log("No SOCKS backend available, dropping connection", 2, error_code="E01")
+            client_writer.close()
+            return
+        
+        backend.active += 1
+        backend.total += 1
+        try:
+            await asyncio.gather(
+                self.pipe(client_reader, backend_writer, client_writer, backend, upstream=True),
+                self.pipe(backend_reader, client_writer, backend_writer, backend, upstream=False)
+            )
+        finally:
+            backend.active -= 1
+            for writer in (backend_writer, client_writer):
+                writer.close()
+    
+    def track_client(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        task = asyncio.ensure_future(self.handle_client(client_reader, client_writer))
+        self.client_tasks.add(task)
+        task.add_done_callback(self.client_tasks.discard)
+    
+    # ==================== LIFECYCLE ====================
+    async def start(self) -> bool:
+        """Start listening on the running event loop"""
+        try:
+            self.loop = asyncio.get_running_loop()
+            self.server = await asyncio.start_server(self.track_client, self.listen_host, self.listen_port)
+            self.listen_port = self.server.sockets[0].getsockname()[1]
+            self.log("SOCKS front proxy listening | Address: %s:%s | Backends: %s", args=(self.listen_host, self.listen_port, len(self.current_backends())))
+            return True
+        except Exception as e:
+            self.log("SOCKS front proxy failed to start | Address: %s:%s", 2, e, error_code="E02", args=(self.listen_host, self.listen_port))
+            return False
+    
+    async def close(self) -> None:
+        """Stop listening and drop relayed connections"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for task in list(self.client_tasks):
+            task.cancel()
+        if self.client_tasks:
+            await asyncio.gather(*self.client_tasks, return_exceptions=True)
+        self.log("SOCKS front proxy stopped")
+    
+    def start_in_thread(self, timeout: float = 10) -> bool:
+        """Run the proxy on its own event loop in a daemon thread (for synchronous callers)"""
+        started = threading.Event()
+        result = {}
+        
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            result['ok'] = loop.run_until_complete(self.start())
+            started.set()
+            if result['ok']:
+                loop.run_forever()
+            loop.close()
+        
+        self.thread = threading.Thread(target=run, name="dtor-socks-proxy", daemon=True)
+        self.thread.start()
+        started.wait(timeout)
+        return result.get('ok', False)
+    
+    def stop(self) -> None:
+        """Stop a proxy started with start_in_thread"""
+        if self.loop is None or self.thread is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self.close(), self.loop)
+        try:
+            future.result(timeout=10)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=10)
+            self.thread = None
+    
+    def get_stats(self) -> Dict:
+        return {
+            'listen': f"{self.listen_host}:{self.listen_port}",
+            'total_connections': self.total_connections,
+            'rejected_connections': self.rejected_connections,
+            'active_connections': sum(backend.active for backend in self.backends.values()),
+            'backends': [backend.get_stats() for backend in self.backends.values()]
+        }
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,314 @@
+import time
+import inspect
+import threading
+import functools
+import contextvars
+from typing import Optional, Dict, List, Tuple, Callable
+
+# Spans of the instrumented calls currently running in this thread / asyncio task
+ACTIVE_SPANS: contextvars.ContextVar = contextvars.ContextVar("dtor_active_spans", default=())
+
+
+class LatencyHistogram:
+    """Log-linear (HDR-style) histogram of durations with microsecond resolution
+    
+    Values below 128µs get exact buckets; above that every power of two is split
+    into 64 buckets, so any recorded value is reported within ~1.6% while a bucket
+    update stays a dict increment, whatever the range.
+    """
+    
+    SUB_BUCKET_BITS = 6
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = 0.0
+        self.max = 0.0
+    
+    @classmethod
+    def bucket_index(cls, micros: int) -> int:
+        if micros < 2 * cls.SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - cls.SUB_BUCKET_BITS - 1
+        return 2 * cls.SUB_BUCKETS + (shift - 1) * cls.SUB_BUCKETS + (micros >> shift) - cls.SUB_BUCKETS
+    
+    @classmethod
+    def bucket_bounds(cls, index: int) -> Tuple[int, int]:
+        """Lowest and highest microsecond value counted in a bucket"""
+        if index < 2 * cls.SUB_BUCKETS:
+            return index, index
+        shift, offset = divmod(index - 2 * cls.SUB_BUCKETS, cls.SUB_BUCKETS)
+        mantissa = offset + cls.SUB_BUCKETS
+        return mantissa << (shift + 1), ((mantissa + 1) << (shift + 1)) - 1
+    
+    def record(self, seconds: float) -> None:
+        index = self.bucket_index(max(int(seconds * 1_000_000), 0))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        if not self.count or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.count += 1
+        self.total += seconds
+    
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        if other.count:
+            self.min = min(self.min, other.min) if self.count else other.min
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+    
+    def percentile(self, percent: float) -> float:
+        """Duration in seconds at or below which ``percent`` of the values fall"""
+        if not self.count:
+            return 0.0
+        target = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(max(self.bucket_bounds(index)[1] / 1_000_000, self.min), self.max)
+        return self.max
+    
+    def count_at_or_below(self, seconds: float) -> int:
+        """Values recorded at or below ``seconds`` (to bucket precision), for cumulative buckets"""
+        limit = seconds * 1_000_000
+        return sum(count for index, count in self.counts.items() if self.bucket_bounds(index)[0] <= limit)
+    
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'min': round(self.min, 6),
+            'max': round(self.max, 6),
+            'mean': round(self.total / self.count, 6) if self.count else 0.0,
+            'p50': round(self.percentile(50), 6),
+            'p90': round(self.percentile(90), 6),
+            'p99': round(self.percentile(99), 6),
+            'p999': round(self.percentile(99.9), 6)
+        }
+
+
+class OperationStats:
+    """Duration histogram, outcome counts and error codes of one func_id"""
+    
+    def __init__(self, func_id: str, name: str):
+        self.func_id = func_id
+        self.name = name
+        self.histogram = LatencyHistogram()
+        self.outcomes: Dict[str, int] = {'ok': 0, 'error': 0, 'exception': 0}
+        self.error_codes: Dict[str, int] = {}
+    
+    def get_stats(self) -> Dict:
+        return dict(self.histogram.get_stats(), operation=self.name, outcomes=dict(self.outcomes),
+                    error_codes=dict(self.error_codes))
+
+
+class OperationSpan:
+    """One instrumented call, handed to hooks once it has finished"""
+    
+    __slots__ = ('owner', 'func_id', 'name', 'parent', 'started_at', 'started', 'duration', 'outcome',
+                 'error_code', 'exception', 'otel_span', 'otel_token')
+    
+    def __init__(self, owner: "Instrumentation", func_id: str, name: str, parent: Optional["OperationSpan"]):
+        self.owner = owner
+        self.func_id = func_id
+        self.name = name
+        self.parent = parent
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.outcome = ''
+        self.error_code = ''
+        self.exception: Optional[BaseException] = None
+        self.otel_span = None
+        self.otel_token = None
+    
+    def __repr__(self) -> str:
+        return f"OperationSpan({self.func_id} {self.name}, {self.duration:.6f}s, {self.outcome or 'running'})"
+
+
+class Instrumentation:
+    """Per-func_id timing for a TorHandler (or TorPool)
+    
+    Methods decorated with ``instrumented`` open a span for each call; error codes
+    passed to the owner's logger during the call are attached to it. Finished spans
+    are recorded into histograms and passed to every hook, and optionally mirrored
+    as OpenTelemetry spans.
+    """
+    
+    def __init__(self, logger=None):
+        self.enabled = True
+        self.logger = logger
+        self.operations: Dict[str, OperationStats] = {}
+        self.hooks: List[Callable[[OperationSpan], None]] = []
+        self.lock = threading.Lock()
+        self.tracer = None
+        self.otel_trace = None
+        self.otel_context = None
+    
+    # ==================== SPANS ====================
+    def start(self, func_id: str, name: str) -> OperationSpan:
+        active = ACTIVE_SPANS.get()
+        span = OperationSpan(self, func_id, name, active[-1] if active else None)
+        ACTIVE_SPANS.set(active + (span,))
+        
+        if self.tracer is not None:
+            span.otel_span = self.tracer.start_span(name, attributes={'dtor.func_id': func_id})
+            span.otel_token = self.otel_context.attach(self.otel_trace.set_span_in_context(span.otel_span))
+        return span
+    
+    def finish(self, span: OperationSpan, exception: Optional[BaseException] = None, result=None) -> None:
+        span.duration = time.perf_counter() - span.started
+        span.exception = exception
+        if exception is not None:
+            span.outcome = 'exception'
+        elif span.error_code or result is False:
+            span.outcome = 'error'
+        else:
+            span.outcome = 'ok'
+        
+        active = ACTIVE_SPANS.get()
+        if span in active:
+            ACTIVE_SPANS.set(active[:active.index(span)])
+        
+        with self.lock:
+            stats = self.operations.get(span.func_id)
+            if stats is None:
+                stats = self.operations[span.func_id] = OperationStats(span.func_id, span.name)
+            stats.histogram.record(span.duration)
+            stats.outcomes[span.outcome] += 1
+            if span.error_code:
+                stats.error_codes[span.error_code] = stats.error_codes.get(span.error_code, 0) + 1
+        
+        if span.otel_span is not None:
+            self.end_otel_span(span)
+        
+        for hook in list(self.hooks):
+            try:
+                hook(span)
+            except Exception as e:
+                if self.logger:
+                    self.logger("Instrumentation hook failed", 1, e, func_id="F53")
+    
+    def note_error(self, func_id: str, error_code: str) -> None:
+        """Attach an error code to the innermost running span of ``func_id``"""
+        for span in reversed(ACTIVE_SPANS.get()):
+            if span.owner is self and span.func_id == func_id:
+                span.error_code = error_code
+                return
+    
+    # ==================== HOOKS ====================
+    def add_hook(self, hook: Callable[[OperationSpan], None]) -> None:
+        """Call ``hook(span)`` after every instrumented call"""
+        self.hooks.append(hook)
+    
+    def remove_hook(self, hook: Callable[[OperationSpan], None]) -> None:
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+    
+    def enable_opentelemetry(self, tracer=None) -> bool:
+        """Mirror every span to OpenTelemetry (needs the opentelemetry-api package)
+        
+        Args:
+            tracer: Tracer to use (defaults to ``trace.get_tracer("dtor")``)
+        
+        Returns:
+            True if enabled, False if OpenTelemetry is not installed
+        """
+        try:
+            from opentelemetry import trace, context
+        except ImportError:
+            if self.logger:
+                self.logger("OpenTelemetry not installed | Package: opentelemetry-api", 1, func_id="F53")
+            return False
+        
+        self.otel_trace = trace
+        self.otel_context = context
+        self.tracer = tracer or trace.get_tracer("dtor")
+        return True
+    
+    def disable_opentelemetry(self) -> None:
+        self.tracer = None
+    
+    def end_otel_span(self, span: OperationSpan) -> None:
+        otel_span = span.otel_span
+        otel_span.set_attribute('dtor.outcome', span.outcome)
+        if span.error_code:
+            otel_span.set_attribute('dtor.error_code', span.error_code)
+        if span.outcome != 'ok':
+            otel_span.set_status(self.otel_trace.Status(self.otel_trace.StatusCode.ERROR, span.error_code or None))
+        if span.exception is not None:
+            otel_span.record_exception(span.exception)
+        try:
+            self.otel_context.detach(span.otel_token)
+        except Exception:
+            pass
+        otel_span.end()
+    
+    # ==================== STATISTICS ====================
+    def get_stats(self) -> Dict[str, Dict]:
+        """Per func_id: operation name, count, sum/min/max/mean, percentiles, outcomes and error codes"""
+        with self.lock:
+            return {func_id: stats.get_stats() for func_id, stats in sorted(self.operations.items())}
+    
+    def get_histograms(self) -> Dict[str, Tuple[str, LatencyHistogram]]:
+        """Copies of the histograms as {func_id: (operation name, histogram)}"""
+        with self.lock:
+            histograms = {}
+            for func_id, stats in sorted(self.operations.items()):
+                histogram = LatencyHistogram()
+                histogram.merge(stats.histogram)
+                histograms[func_id] = (stats.name, histogram)
+            return histograms
+    
+    def reset(self) -> None:
+        with self.lock:
+            self.operations = {}
+
+
+def instrumented(func_id: str):
+    """Time every call of a TorHandler/TorPool method under ``func_id``
+    
+    Works for plain methods and coroutines; does nothing for objects without an
+    enabled ``instrumentation`` attribute.
+    """
+    def decorate(method):
+        name = method.__name__
+        
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                instrumentation = getattr(self, 'instrumentation', None)
+                if instrumentation is None or not instrumentation.enabled:
+                    return await method(self, *args, **kwargs)
+                span = instrumentation.start(func_id, name)
+                try:
+                    result = await method(self, *args, **kwargs)
+                except BaseException as e:
+                    instrumentation.finish(span, e)
+                    raise
+                instrumentation.finish(span, None, result)
+                return result
+            return async_wrapper
+        
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            instrumentation = getattr(self, 'instrumentation', None)
+            if instrumentation is None or not instrumentation.enabled:
+                return method(self, *args, **kwargs)
+            span = instrumentation.start(func_id, name)
+            try:
+                result = method(self, *args, **kwargs)
+            except BaseException as e:
+                instrumentation.finish(span, e)
+                raise
+            instrumentation.finish(span, None, result)
+            return result
+        return wrapper
+    
+    return decorate
@@ -330,5 +330,5 @@ print(f"  ✓ Control port authentication and commands")
 print(f"  ✓ Process management and monitoring")
 print(f"  ✓ Stale process cleanup")
 print(f"  ✓ Configuration persistence (torrc)")
-print("\n📝 Check 'tor_handler.log' for detailed logs")
+print(f"\n📝 Check '{handler.log_file}' for detailed logs")
 print("="*80)
\ No newline at end of file